@@ -8,27 +8,44 @@
 
 # Import the necessary libraries.
 # Playwright is used to crawl the Facebook Marketplace.
-from playwright.sync_api import sync_playwright, Page
+from playwright.sync_api import sync_playwright, Page, TimeoutError as PlaywrightTimeoutError
 # The os library is used to get the environment variables.
 import os
 # The time library is used to add a delay to the script.
 import time
 # The BeautifulSoup library is used to parse the HTML.
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString, FeatureNotFound
+# lxml and selectolax are optional C-backed HTML parsers used when installed.
+try:
+    import lxml  # noqa: F401 - used as the BeautifulSoup tree builder
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
 # The FastAPI library is used to create the API.
 from fastapi import HTTPException, FastAPI
+from pydantic import BaseModel
+from typing import List, Optional
 # The JSON library is used to convert the data to JSON.
 import json
 # The uvicorn library is used to run the API.
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 # The logging library is used for error logging.
 import logging
 import traceback
 # Threading and queue for Playwright worker
+import asyncio
 import threading
 import queue
-from concurrent.futures import ThreadPoolExecutor
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+import math
+import random
 import uuid
 import smtplib
 import ssl
@@ -38,8 +55,16 @@ from email.mime.image import MIMEImage
 import requests
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlparse
 import os
 from dotenv import load_dotenv
+from listing_store import ListingStore, NotifiedItemsCache, NOTIFICATION_TRACKING_FILE
+from listing_identity import extract_item_id, canonical_listing_url
+from listing import (
+    Listing, dump_json, filter_listings, is_price_text, parse_price, listed_at_from_age,
+    PRICE_PATTERN, AGE_PATTERN, LOCATION_PATTERN, FREE_PRICE_TEXTS, AGE_RE, LOCATION_RE,
+)
+from listing_relevance import compile_query
 
 # Load environment variables
 load_dotenv()
@@ -50,6 +75,12 @@ logger = logging.getLogger(__name__)
                  
 # Create an instance of the FastAPI class.
 app = FastAPI()
+
+class ListingJSONResponse(JSONResponse):
+    """JSON response that serializes Listing records directly, with orjson when it is installed"""
+
+    def render(self, content):
+        return dump_json(content)
 # Configure CORS
 origins = [
     "http://localhost",
@@ -65,84 +96,239 @@ app.add_middleware(
     allow_headers=["Content-Type"],
 )
 
+# Start the saved-search scheduler when the API is served
+@app.on_event("startup")
+async def startup_event():
+    search_scheduler.start()
+    logger.info("Application startup - saved search scheduler started")
+
 # Clean up browser resources on app shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
+    search_scheduler.stop()
     shutdown_playwright_worker()
     logger.info("Application shutdown - playwright worker stopped")
+    notification_dispatcher.stop()
+    notified_items_cache.stop()
+    logger.info("Application shutdown - notified items flushed")
 
 # Playwright Worker System to avoid asyncio conflicts
+# Crawl jobs are put on a shared queue and drained by a pool of worker threads.
+# Every worker owns its own Playwright instance, Chromium context and page, so
+# several crawls can run at the same time. A worker only pulls from the queue
+# when it is free, which makes the queue itself the dispatcher. Results are
+# handed back through a Future attached to each job.
 job_queue = queue.Queue()
-result_queues = {}
-playwright_worker_thread = None
 playwright_shutdown_event = threading.Event()
 
-# Global browser variables (managed by worker thread)
-browser = None
-page = None
-playwright_instance = None
+# Seconds a single crawl job may take, including its time waiting in the queue
+CRAWL_JOB_TIMEOUT = 120
 
-def playwright_worker():
-    """Dedicated worker thread for all Playwright operations"""
-    global browser, page, playwright_instance
-    
-    logger.info("Playwright worker thread started")
+# Number of parallel browser workers
+WORKER_POOL_SIZE = max(1, int(os.getenv('WORKER_POOL_SIZE', '3')))
+# Consecutive failed crawls before a worker is marked unhealthy and recycled
+WORKER_MAX_CONSECUTIVE_FAILURES = int(os.getenv('WORKER_MAX_CONSECUTIVE_FAILURES', '3'))
+# Seconds an unhealthy worker sits out before restarting its browser
+WORKER_UNHEALTHY_COOLDOWN = float(os.getenv('WORKER_UNHEALTHY_COOLDOWN', '30'))
+
+# Worker 0 uses the original persistent profile. Chromium locks a profile directory
+# to one process, so the other workers get their own profile directories and pick up
+# the login cookies from a shared session snapshot, written whenever a worker confirms
+# it is logged in.
+FB_PROFILE_DIR = "fb_profile"
+FB_SESSION_STATE_FILE = "fb_session_state.json"
+
+# Only one worker at a time may walk the user through a manual login
+login_lock = threading.Lock()
+
+# Session-state cache: while the login was confirmed within the TTL, crawls navigate
+# straight to the marketplace and skip the login probe page load.
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', '1800'))
+# Every worker has its own browser profile, so the confirmation is kept per worker:
+# worker_id -> monotonic time its login was last confirmed
+session_confirmed_at = {}
+session_state_lock = threading.Lock()
+
+
+class BrowserWorker:
+    """State of a single pooled Playwright worker thread"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.thread = None
+        self.playwright_instance = None
+        self.browser = None
+        self.page = None
+        self.busy = False
+        self.current_job = None
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.last_error = None
+        self.last_job_finished_at = None
+        self.resource_stats = new_resource_stats()
+
+    def reset_resource_stats(self):
+        """Start counting blocked requests for a new crawl"""
+        self.resource_stats = new_resource_stats()
+
+    def record_blocked_request(self, resource_type):
+        stats = self.resource_stats
+        stats['blocked_requests'] += 1
+        stats['blocked_by_type'][resource_type] = stats['blocked_by_type'].get(resource_type, 0) + 1
+        stats['estimated_bytes_saved'] += RESOURCE_SIZE_ESTIMATES.get(resource_type, RESOURCE_SIZE_ESTIMATES['other'])
+
+    @property
+    def profile_dir(self):
+        if self.worker_id == 0:
+            return FB_PROFILE_DIR
+        return f"{FB_PROFILE_DIR}_worker{self.worker_id}"
+
+    def status(self):
+        """Snapshot of the worker's health for the status endpoint"""
+        return {
+            'worker_id': self.worker_id,
+            'alive': self.thread is not None and self.thread.is_alive(),
+            'busy': self.busy,
+            'current_job': self.current_job,
+            'healthy': self.healthy,
+            'browser_open': self.browser is not None,
+            'consecutive_failures': self.consecutive_failures,
+            'jobs_completed': self.jobs_completed,
+            'jobs_failed': self.jobs_failed,
+            'last_error': self.last_error,
+            'last_job_finished_at': self.last_job_finished_at,
+        }
+
+
+# Resource blocking: we only need the listing markup and image URLs, not the image,
+# font or video bytes. Requests are filtered with Playwright request routing.
+RESOURCE_BLOCKING_ENABLED = os.getenv('RESOURCE_BLOCKING_ENABLED', 'true').lower() == 'true'
+# Resource types (as reported by Playwright) that are aborted
+BLOCKED_RESOURCE_TYPES = [t.strip() for t in os.getenv('BLOCKED_RESOURCE_TYPES', 'image,media,font').split(',') if t.strip()]
+# Domains whose requests are always aborted, whatever their type (e.g. trackers)
+BLOCKED_DOMAINS = [d.strip() for d in os.getenv('BLOCKED_DOMAINS', '').split(',') if d.strip()]
+# Domains that are never blocked, even for blocked resource types
+ALLOWED_DOMAINS = [d.strip() for d in os.getenv('ALLOWED_DOMAINS', '').split(',') if d.strip()]
+# Typical response sizes used to estimate the bandwidth saved by blocking
+RESOURCE_SIZE_ESTIMATES = {
+    'image': 40_000,
+    'media': 500_000,
+    'font': 60_000,
+    'script': 80_000,
+    'stylesheet': 30_000,
+    'other': 5_000,
+}
+
+def new_resource_stats():
+    return {'blocked_requests': 0, 'blocked_by_type': {}, 'estimated_bytes_saved': 0}
+
+worker_pool = [BrowserWorker(worker_id) for worker_id in range(WORKER_POOL_SIZE)]
+
+# Readiness engine: instead of sleeping a fixed time after navigation, wait until the
+# marketplace item anchors are rendered and their count has stopped changing.
+LISTING_ANCHOR_SELECTOR = 'a[href*="/marketplace/item/"]'
+# Upper bound on how long to wait for the listings grid
+LISTINGS_READY_TIMEOUT = float(os.getenv('LISTINGS_READY_TIMEOUT', '10'))
+# How often to re-count the item anchors
+LISTINGS_READY_POLL_INTERVAL = float(os.getenv('LISTINGS_READY_POLL_INTERVAL', '0.25'))
+# Number of consecutive polls with an unchanged anchor count that counts as "ready"
+LISTINGS_READY_STABLE_POLLS = int(os.getenv('LISTINGS_READY_STABLE_POLLS', '3'))
+# The fixed sleep the readiness engine replaced, used to report latency saved
+FIXED_WAIT_BASELINE_SECONDS = 5.0
+
+# Per-crawl timing metrics, most recent last
+crawl_metrics = deque(maxlen=500)
+crawl_metrics_lock = threading.Lock()
+
+def playwright_worker(worker):
+    """Worker thread loop for all Playwright operations of one pooled browser"""
+    logger.info(f"Playwright worker {worker.worker_id} started")
     
     while not playwright_shutdown_event.is_set():
+        # Let an unhealthy worker cool down so the healthy ones pick up the jobs
+        if not worker.healthy:
+            if playwright_shutdown_event.wait(WORKER_UNHEALTHY_COOLDOWN):
+                break
+            try:
+                restart_browser_worker(worker)
+                worker.healthy = True
+                worker.consecutive_failures = 0
+            except Exception as e:
+                worker.last_error = str(e)
+                continue
+
         try:
             # Wait for jobs with timeout to allow clean shutdown
             job = job_queue.get(timeout=1.0)
-            job_id = job.get('job_id')
-            action = job.get('action')
-            
-            try:
-                if action == 'crawl':
-                    # Initialize browser if needed - start in headless mode by default
-                    if browser is None or page is None:
-                        initialize_browser_worker(headless=True)
-                    
-                    # Perform the crawl
-                    result = crawl_query_worker(
-                        job['city'], 
-                        job['query'], 
-                        job['max_price'], 
-                        job['max_results'], 
-                        job['suggested']
-                    )
-                    
-                    # Send result back
-                    if job_id in result_queues:
-                        result_queues[job_id].put({'success': True, 'data': result})
-                        
-                elif action == 'shutdown':
-                    logger.info("Playwright worker received shutdown signal")
-                    cleanup_browser_resources_worker()
-                    break
-                    
-            except Exception as e:
-                logger.error(f"Error in playwright worker: {e}")
-                if job_id in result_queues:
-                    result_queues[job_id].put({'success': False, 'error': str(e)})
-                
-            finally:
-                job_queue.task_done()
-                
         except queue.Empty:
             continue  # Timeout, check shutdown flag
+
+        action = job.get('action')
+        future = job.get('future')
+
+        try:
+            if action == 'crawl':
+                # Skip jobs whose caller already gave up waiting
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                worker.busy = True
+                worker.current_job = f"{job['query']} (suggested={job['suggested']})"
+
+                # Initialize browser if needed - start in headless mode by default
+                if worker.browser is None or worker.page is None:
+                    initialize_browser_worker(worker, headless=True)
+                
+                # Perform the crawl
+                result = crawl_query_worker(
+                    worker,
+                    job['city'], 
+                    job['query'], 
+                    job['max_price'], 
+                    job['max_results'], 
+                    job['suggested']
+                )
+                
+                worker.jobs_completed += 1
+                worker.consecutive_failures = 0
+
+                # Send result back
+                future.set_result(result)
+                    
+            elif action == 'shutdown':
+                logger.info(f"Playwright worker {worker.worker_id} received shutdown signal")
+                break
+                
         except Exception as e:
-            logger.error(f"Unexpected error in playwright worker: {e}")
+            logger.error(f"Error in playwright worker {worker.worker_id}: {e}")
+            worker.jobs_failed += 1
+            worker.consecutive_failures += 1
+            worker.last_error = str(e)
+            if worker.consecutive_failures >= WORKER_MAX_CONSECUTIVE_FAILURES:
+                logger.warning(f"Playwright worker {worker.worker_id} marked unhealthy after {worker.consecutive_failures} consecutive failures")
+                worker.healthy = False
+            if future is not None and future.running():
+                future.set_exception(e)
+            
+        finally:
+            worker.busy = False
+            worker.current_job = None
+            worker.last_job_finished_at = datetime.now().timestamp()
+            job_queue.task_done()
     
-    logger.info("Playwright worker thread stopping")
+    cleanup_browser_resources_worker(worker)
+    logger.info(f"Playwright worker {worker.worker_id} stopping")
 
-def initialize_browser_worker(headless=True):
+def initialize_browser_worker(worker, headless=True):
     """Initialize browser in worker thread context"""
-    global browser, page, playwright_instance
     try:
-        if browser is None:
-            playwright_instance = sync_playwright().start()
+        if worker.browser is None:
+            worker.playwright_instance = sync_playwright().start()
             # Use persistent context to maintain login sessions across crashes
-            browser = playwright_instance.chromium.launch_persistent_context(
-                user_data_dir="fb_profile",  # Persistent user data directory
+            worker.browser = worker.playwright_instance.chromium.launch_persistent_context(
+                user_data_dir=worker.profile_dir,  # Persistent user data directory
                 headless=headless,
                 args=[
                     '--enable-logging', 
@@ -153,151 +339,329 @@ def initialize_browser_worker(headless=True):
                     '--allow-running-insecure-content'
                 ]
             )
+            # Pick up the login from whichever worker last signed in
+            load_shared_session_state(worker)
+            if worker.worker_id == 0 and not Path(FB_SESSION_STATE_FILE).exists():
+                # An existing install is logged in through the original profile only;
+                # share it before the other workers need it
+                save_shared_session_state(worker)
+            install_resource_blocking(worker)
             # For persistent context, browser acts as both browser and page context
             # Get the first page or create one if none exists
-            if len(browser.pages) > 0:
-                page = browser.pages[0]
+            if len(worker.browser.pages) > 0:
+                worker.page = worker.browser.pages[0]
             else:
-                page = browser.new_page()
+                worker.page = worker.browser.new_page()
             headless_status = "headless" if headless else "visible"
-            logger.info(f"Browser initialized successfully with persistent context ({headless_status}) in worker thread")
+            logger.info(f"Browser initialized successfully with persistent context ({headless_status}) in worker {worker.worker_id}")
     except Exception as e:
-        logger.error(f"Error initializing browser in worker: {e}")
-        cleanup_browser_resources_worker()
+        logger.error(f"Error initializing browser in worker {worker.worker_id}: {e}")
+        cleanup_browser_resources_worker(worker)
         raise e
 
-def cleanup_browser_resources_worker():
+def cleanup_browser_resources_worker(worker):
     """Clean up browser resources in worker thread context"""
-    global browser, page, playwright_instance
     try:
-        if browser:
-            browser.close()
+        if worker.browser:
+            worker.browser.close()
     except Exception as e:
-        logger.warning(f"Error closing browser in worker: {e}")
+        logger.warning(f"Error closing browser in worker {worker.worker_id}: {e}")
     
     try:
-        if playwright_instance:
-            playwright_instance.stop()
+        if worker.playwright_instance:
+            worker.playwright_instance.stop()
     except Exception as e:
-        logger.warning(f"Error stopping playwright in worker: {e}")
+        logger.warning(f"Error stopping playwright in worker {worker.worker_id}: {e}")
     
-    browser = None
-    page = None
-    playwright_instance = None
+    worker.browser = None
+    worker.page = None
+    worker.playwright_instance = None
+
+def domain_matches(host, domains):
+    """Check whether host is one of the domains or a subdomain of one"""
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+def should_block_request(resource_type, url):
+    """Decide whether a browser request is aborted by the resource-blocking layer"""
+    host = urlparse(url).hostname or ''
+    if domain_matches(host, ALLOWED_DOMAINS):
+        return False
+    if domain_matches(host, BLOCKED_DOMAINS):
+        return True
+    return resource_type in BLOCKED_RESOURCE_TYPES
+
+def install_resource_blocking(worker):
+    """Route every request of the worker's context through the blocking rules"""
+    if not RESOURCE_BLOCKING_ENABLED:
+        return
+
+    def handle_route(route):
+        request = route.request
+        if should_block_request(request.resource_type, request.url):
+            worker.record_blocked_request(request.resource_type)
+            route.abort()
+        else:
+            route.continue_()
+
+    worker.browser.route("**/*", handle_route)
+
+def save_shared_session_state(worker):
+    """Write the worker's cookies to the snapshot shared by the whole pool"""
+    try:
+        state = worker.browser.storage_state()
+        # Write a temporary file and rename it over the snapshot, so a worker loading it
+        # at the same time never reads a half-written file
+        temp_path = f'{FB_SESSION_STATE_FILE}.{worker.worker_id}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, FB_SESSION_STATE_FILE)
+        logger.info(f"Worker {worker.worker_id} saved shared session state")
+    except Exception as e:
+        logger.warning(f"Error saving shared session state from worker {worker.worker_id}: {e}")
+
+def load_shared_session_state(worker):
+    """Load the shared login cookies into the worker's browser context"""
+    try:
+        if Path(FB_SESSION_STATE_FILE).exists():
+            with open(FB_SESSION_STATE_FILE, 'r') as f:
+                state = json.load(f)
+            cookies = state.get('cookies', [])
+            if cookies:
+                worker.browser.add_cookies(cookies)
+                logger.info(f"Worker {worker.worker_id} loaded {len(cookies)} shared session cookies")
+    except Exception as e:
+        logger.warning(f"Error loading shared session state in worker {worker.worker_id}: {e}")
+
+def mark_session_valid(worker):
+    """Remember that the worker's Facebook session was just confirmed as logged in"""
+    with session_state_lock:
+        session_confirmed_at[worker.worker_id] = time.monotonic()
+
+def invalidate_session(worker):
+    """Forget the worker's cached login confirmation so its next crawl probes again"""
+    with session_state_lock:
+        session_confirmed_at.pop(worker.worker_id, None)
+
+def is_session_fresh(worker):
+    """Check whether the worker's login was confirmed within SESSION_TTL_SECONDS"""
+    with session_state_lock:
+        last_confirmed_at = session_confirmed_at.get(worker.worker_id)
+    return last_confirmed_at is not None and time.monotonic() - last_confirmed_at < SESSION_TTL_SECONDS
 
 def start_playwright_worker():
-    """Start the playwright worker thread"""
-    global playwright_worker_thread
-    if playwright_worker_thread is None or not playwright_worker_thread.is_alive():
-        playwright_shutdown_event.clear()
-        playwright_worker_thread = threading.Thread(target=playwright_worker, daemon=True)
-        playwright_worker_thread.start()
-        logger.info("Playwright worker thread started")
+    """Start the pool of playwright worker threads"""
+    playwright_shutdown_event.clear()
+    for worker in worker_pool:
+        if worker.thread is None or not worker.thread.is_alive():
+            worker.thread = threading.Thread(target=playwright_worker, args=(worker,), daemon=True)
+            worker.thread.start()
+    logger.info(f"Playwright worker pool started with {len(worker_pool)} workers")
 
 def shutdown_playwright_worker():
-    """Shutdown the playwright worker thread"""
-    global playwright_worker_thread
-    if playwright_worker_thread and playwright_worker_thread.is_alive():
-        # Signal shutdown
-        playwright_shutdown_event.set()
+    """Shutdown all playwright worker threads"""
+    # Signal shutdown
+    playwright_shutdown_event.set()
+    for worker in worker_pool:
         job_queue.put({'action': 'shutdown'})
-        
-        # Wait for thread to finish
-        playwright_worker_thread.join(timeout=10)
-        if playwright_worker_thread.is_alive():
-            logger.warning("Playwright worker thread did not shut down cleanly")
+
+    # Wait for threads to finish
+    for worker in worker_pool:
+        if worker.thread and worker.thread.is_alive():
+            worker.thread.join(timeout=10)
+            if worker.thread.is_alive():
+                logger.warning(f"Playwright worker {worker.worker_id} did not shut down cleanly")
+            else:
+                logger.info(f"Playwright worker {worker.worker_id} shut down successfully")
+
+def wait_for_listings_ready(page, timeout=None):
+    """Wait until marketplace item anchors appear and their count stops changing"""
+    timeout = LISTINGS_READY_TIMEOUT if timeout is None else timeout
+    start = time.monotonic()
+    deadline = start + timeout
+
+    try:
+        page.wait_for_selector(LISTING_ANCHOR_SELECTOR, state='attached', timeout=timeout * 1000)
+    except PlaywrightTimeoutError:
+        # No listings rendered before the ceiling (empty search or a slow page)
+        return {'ready': False, 'time_to_ready': time.monotonic() - start, 'listing_count': 0}
+
+    last_count = -1
+    stable_polls = 0
+    while time.monotonic() < deadline:
+        count = page.locator(LISTING_ANCHOR_SELECTOR).count()
+        if count == last_count:
+            stable_polls += 1
+            if stable_polls >= LISTINGS_READY_STABLE_POLLS:
+                return {'ready': True, 'time_to_ready': time.monotonic() - start, 'listing_count': count}
         else:
-            logger.info("Playwright worker thread shut down successfully")
+            stable_polls = 0
+            last_count = count
+        page.wait_for_timeout(LISTINGS_READY_POLL_INTERVAL * 1000)
+
+    logger.warning(f"Listings count still changing after {timeout}s, parsing what is rendered")
+    return {'ready': False, 'time_to_ready': time.monotonic() - start, 'listing_count': max(last_count, 0)}
+
+def record_crawl_metrics(metrics):
+    """Keep the timing metrics of one crawl"""
+    with crawl_metrics_lock:
+        crawl_metrics.append(metrics)
+
+def get_crawl_metrics_summary():
+    """Summarize time-to-ready over the recorded crawls"""
+    with crawl_metrics_lock:
+        recent = list(crawl_metrics)
+    if not recent:
+        return {'crawls': 0, 'recent': []}
+
+    ready_times = sorted(m['time_to_ready'] for m in recent)
+    total_times = [m['total_seconds'] for m in recent]
+    avg_ready = sum(ready_times) / len(ready_times)
+    return {
+        'crawls': len(recent),
+        'timed_out': sum(1 for m in recent if not m['ready']),
+        'avg_time_to_ready': round(avg_ready, 3),
+        'p50_time_to_ready': round(ready_times[len(ready_times) // 2], 3),
+        'max_time_to_ready': round(ready_times[-1], 3),
+        'avg_crawl_seconds': round(sum(total_times) / len(total_times), 3),
+        'fixed_wait_baseline_seconds': FIXED_WAIT_BASELINE_SECONDS,
+        'avg_seconds_saved': round(FIXED_WAIT_BASELINE_SECONDS - avg_ready, 3),
+        'blocked_requests': sum(m.get('blocked_requests', 0) for m in recent),
+        'estimated_bytes_saved': sum(m.get('estimated_bytes_saved', 0) for m in recent),
+        'recent': recent[-20:],
+    }
+
+def get_worker_pool_status():
+    """Summarize the pool: which workers are free, busy or unhealthy"""
+    workers = [worker.status() for worker in worker_pool]
+    return {
+        'pool_size': len(worker_pool),
+        'free_workers': sum(1 for w in workers if w['alive'] and w['healthy'] and not w['busy']),
+        'busy_workers': sum(1 for w in workers if w['busy']),
+        'unhealthy_workers': sum(1 for w in workers if not w['healthy']),
+        'queued_jobs': job_queue.qsize(),
+        'workers': workers,
+    }
 
 # Start worker on import
 start_playwright_worker()
 
-def login_and_goto_marketplace_worker(initial_url, marketplace_url):
+def login_and_goto_marketplace_worker(worker, initial_url, marketplace_url):
     """Worker thread version of login function - switches to visible mode when login needed"""
-    global page, browser
     try:
-        if page is None:
+        if worker.page is None:
             logger.error("Page is None, cannot proceed with login")
             return
+
+        # Recently confirmed session - go straight to the marketplace
+        if is_session_fresh(worker):
+            worker.page.goto(marketplace_url)
+            if "login" not in worker.page.url:
+                return
+            logger.info("Marketplace redirected to login, re-checking session")
+            invalidate_session(worker)
             
-        page.goto(initial_url)
-        time.sleep(2)
+        worker.page.goto(initial_url)
         
         # If url does not contain "login", we assume we are logged in and redirect to marketplace
-        if "login" not in page.url:
+        if "login" not in worker.page.url:
             logger.info("Already logged in, proceeding to marketplace")
-            page.goto(marketplace_url)
+            # Keep the snapshot the other workers log in with up to date
+            save_shared_session_state(worker)
+            mark_session_valid(worker)
+            worker.page.goto(marketplace_url)
             return
-            
-        # Login is required - check if we're running headless and need to switch to visible
-        logger.info("Login required - checking browser mode")
+
+        with login_lock:
+            # Another worker may have logged in while we waited for the lock
+            load_shared_session_state(worker)
+            worker.page.goto(initial_url)
+            if "login" not in worker.page.url:
+                logger.info(f"Worker {worker.worker_id} reused login from another worker")
+                mark_session_valid(worker)
+                worker.page.goto(marketplace_url)
+                return
+
+            login_with_visible_browser_worker(worker)
+            save_shared_session_state(worker)
+            mark_session_valid(worker)
         
-        # Check if browser is currently headless by trying to detect if we can interact with login
-        try:
-            # Try to go to Facebook and check if we can see login elements
-            page.goto("https://www.facebook.com")
-            time.sleep(3)
+        # After login, navigate to marketplace; crawl_query_worker() waits for the listings
+        worker.page.goto(marketplace_url)
+        
+    except Exception as e:
+        logger.error(f"Login error in worker {worker.worker_id}: {e}")
+        raise e
+
+def login_with_visible_browser_worker(worker):
+    """Switch the worker to a visible browser and wait for the user to log in"""
+    # Login is required - check if we're running headless and need to switch to visible
+    logger.info("Login required - checking browser mode")
+    
+    # Check if browser is currently headless by trying to detect if we can interact with login
+    try:
+        # Try to go to Facebook and check if we can see login elements
+        worker.page.goto("https://www.facebook.com")
+        wait_for_login_form(worker.page)
+        
+        # Look for login elements
+        login_elements = worker.page.locator('input[name="email"], input[data-testid="royal_email"]').count()
+        
+        if login_elements > 0:
+            logger.info("Login form detected - need visible browser for manual login")
             
-            # Look for login elements
-            login_elements = page.locator('input[name="email"], input[data-testid="royal_email"]').count()
+            # Check if we're running in headless mode
+            try:
+                # Try to detect if browser window is visible
+                is_headless = worker.page.evaluate("() => window.outerHeight === 0 || window.outerWidth === 0")
+                if is_headless:
+                    logger.info("Currently in headless mode, restarting browser in visible mode for login")
+                    cleanup_browser_resources_worker(worker)
+                    initialize_browser_worker(worker, headless=False)  # Restart in visible mode
+                    worker.page.goto("https://www.facebook.com")
+                    wait_for_login_form(worker.page)
+            except Exception as detection_error:
+                logger.warning(f"Could not detect browser mode: {detection_error}, assuming headless")
+                # If we can't detect, restart in visible mode to be safe
+                cleanup_browser_resources_worker(worker)
+                initialize_browser_worker(worker, headless=False)
+                worker.page.goto("https://www.facebook.com")
+                wait_for_login_form(worker.page)
             
-            if login_elements > 0:
-                logger.info("Login form detected - need visible browser for manual login")
-                
-                # Check if we're running in headless mode
-                try:
-                    # Try to detect if browser window is visible
-                    is_headless = page.evaluate("() => window.outerHeight === 0 || window.outerWidth === 0")
-                    if is_headless:
-                        logger.info("Currently in headless mode, restarting browser in visible mode for login")
-                        cleanup_browser_resources_worker()
-                        initialize_browser_worker(headless=False)  # Restart in visible mode
-                        page.goto("https://www.facebook.com")
-                        time.sleep(3)
-                except Exception as detection_error:
-                    logger.warning(f"Could not detect browser mode: {detection_error}, assuming headless")
-                    # If we can't detect, restart in visible mode to be safe
-                    cleanup_browser_resources_worker()
-                    initialize_browser_worker(headless=False)
-                    page.goto("https://www.facebook.com")
-                    time.sleep(3)
-                
-                # Wait for manual login
-                wait_for_user_login(page)
-                
-                # After successful login, we can continue - browser will stay visible for this session
-                logger.info("Login completed successfully")
+            # Wait for manual login
+            wait_for_user_login(worker.page)
             
-        except Exception as e:
-            logger.warning(f"Error checking login status: {e}")
-            # If we can't determine login status, assume login is needed in visible mode
-            cleanup_browser_resources_worker()
-            initialize_browser_worker(headless=False)
-            page.goto("https://www.facebook.com")
-            wait_for_user_login(page)
-        
-        # After login, navigate to marketplace
-        page.goto(marketplace_url)
-        time.sleep(5)  # Wait for marketplace to load
+            # After successful login, we can continue - browser will stay visible for this session
+            logger.info("Login completed successfully")
         
     except Exception as e:
-        logger.error(f"Login error in worker: {e}")
-        raise e
+        logger.warning(f"Error checking login status: {e}")
+        # If we can't determine login status, assume login is needed in visible mode
+        cleanup_browser_resources_worker(worker)
+        initialize_browser_worker(worker, headless=False)
+        worker.page.goto("https://www.facebook.com")
+        wait_for_user_login(worker.page)
+
+def wait_for_login_form(page, timeout=5):
+    """Wait briefly for the Facebook login form instead of sleeping a fixed time"""
+    try:
+        page.wait_for_selector('input[name="email"], input[data-testid="royal_email"]', timeout=timeout * 1000)
+    except PlaywrightTimeoutError:
+        # No login form - most likely already logged in
+        pass
 
-def restart_browser_worker():
+def restart_browser_worker(worker):
     """Worker thread version of browser restart - starts in headless mode by default"""
-    global browser, page
-    logger.warning("Restarting browser in worker thread...")
+    logger.warning(f"Restarting browser in worker {worker.worker_id}...")
     
     # Clean up existing resources
-    cleanup_browser_resources_worker()
+    cleanup_browser_resources_worker(worker)
     
     # Try to initialize browser once - start headless by default
     try:
-        initialize_browser_worker(headless=True)  # Default to headless mode
-        logger.info("Browser restarted successfully in worker thread (headless mode)")
+        initialize_browser_worker(worker, headless=True)  # Default to headless mode
+        logger.info(f"Browser restarted successfully in worker {worker.worker_id} (headless mode)")
     except Exception as e:
-        logger.error(f"Failed to restart browser in worker thread: {e}")
+        logger.error(f"Failed to restart browser in worker {worker.worker_id}: {e}")
         raise e
 
 def wait_for_user_login(page):
@@ -326,12 +690,200 @@ def root():
     # Return a message.
     return {"message": "Welcome to Passivebot's Facebook Marketplace API. Documentation is currently being worked on along with the API. Some planned features currently in the pipeline are a ReactJS frontend, MongoDB database, and Google Authentication."}
 
+# Create a route to the worker pool status endpoint.
+@app.get("/worker_pool")
+def worker_pool_status():
+    # Return the health and availability of every browser worker.
+    return get_worker_pool_status()
+
+# Create a route to the crawl metrics endpoint.
+@app.get("/crawl_metrics")
+def crawl_metrics_summary():
+    # Return time-to-ready statistics for the recent crawls.
+    return {**get_crawl_metrics_summary(), 'result_cache': crawl_result_cache.stats(), 'notifications': notification_dispatcher.stats,
+            'shared_crawls': search_scheduler.stats}
+
 # Create a route to the return_data endpoint.
 @app.get("/crawl_facebook_marketplace")
 # Define a function to be executed when the endpoint is called.
 # Add a description to the function.
 # TODO: days since listed input
-def crawl_facebook_marketplace(city: str, query: str, max_price: int, max_results_per_query: int):
+async def crawl_facebook_marketplace(city: str, query: str, max_price: int, max_results_per_query: int, since: Optional[float] = None,
+                                     min_price: Optional[int] = None, max_age_hours: Optional[float] = None):
+    # Get the city location id, or a 404 for unsupported cities.
+    city = resolve_city(city)
+        
+    # Define the URL to scrape.
+    results = []
+    # Split the query into a list
+    query_list = query.split(',')
+
+    # Fan out the recent and suggested crawl of every query at once so the pool can run them in parallel.
+    # The result cache answers repeated searches and joins identical in-flight crawls.
+    query_jobs, cache_statuses = start_query_crawls(city, query_list, max_price, max_results_per_query)
+    headers = cache_headers(cache_statuses)
+    # Jobs queue behind each other once every worker is busy, so scale the timeout with the backlog
+    timeout = CRAWL_JOB_TIMEOUT * math.ceil(2 * len(query_list) / WORKER_POOL_SIZE)
+    # Awaiting the futures does not hold a server thread while the browsers work
+    crawl_results = await asyncio.gather(*(
+        wait_for_crawl_result_async(future, timeout) for futures in query_jobs for future in futures
+    ))
+
+    for index, query in enumerate(query_list):
+      recent_query_results = crawl_results[2 * index]
+      suggested_results = crawl_results[2 * index + 1]
+      results.extend(await finish_query_results(city, query, recent_query_results, suggested_results, min_price, max_age_hours))
+
+    # Pass the cursor back as `since` to only get listings first seen after this request
+    cursor = time.time()
+    headers['X-Cursor'] = f'{cursor:.6f}'
+    if since is not None:
+        results = await filter_first_seen_since(results, since, cursor)
+
+    # Listing records are serialized straight to JSON, skipping FastAPI's generic encoder
+    return ListingJSONResponse(results, headers=headers)
+
+# Media types of the streaming endpoint's output formats
+STREAM_MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
+# Create a route to the streaming version of the crawl endpoint.
+@app.get("/crawl_facebook_marketplace/stream")
+async def crawl_facebook_marketplace_stream(city: str, query: str, max_price: int, max_results_per_query: int, format: str = 'ndjson', since: Optional[float] = None,
+                                            min_price: Optional[int] = None, max_age_hours: Optional[float] = None):
+    """Stream each query's merged results as soon as its crawls finish, as NDJSON or Server-Sent Events"""
+    city = resolve_city(city)
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(400, f"Unknown stream format '{format}', use one of {', '.join(STREAM_MEDIA_TYPES)}")
+    query_list = query.split(',')
+
+    query_jobs, cache_statuses = start_query_crawls(city, query_list, max_price, max_results_per_query)
+    timeout = CRAWL_JOB_TIMEOUT * math.ceil(2 * len(query_list) / WORKER_POOL_SIZE)
+
+    async def crawl_one_query(query, recent_future, suggested_future):
+        started = time.monotonic()
+        recent_query_results, suggested_results = await asyncio.gather(
+            wait_for_crawl_result_async(recent_future, timeout),
+            wait_for_crawl_result_async(suggested_future, timeout),
+        )
+        results = await finish_query_results(city, query, recent_query_results, suggested_results, min_price, max_age_hours)
+        return query, results, time.monotonic() - started
+
+    async def events():
+        tasks = [asyncio.create_task(crawl_one_query(query, *futures)) for query, futures in zip(query_list, query_jobs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                query, results, seconds = await next_done
+                if since is not None:
+                    results = await filter_first_seen_since(results, since, time.time())
+                yield encode_stream_event('results', {'query': query, 'seconds': round(seconds, 3), 'results': results}, format)
+            yield encode_stream_event('done', {'queries': len(query_list), 'cursor': f'{time.time():.6f}'}, format)
+        finally:
+            # The client went away: stop waiting on crawls nobody will read
+            for task in tasks:
+                task.cancel()
+
+    headers = {**cache_headers(cache_statuses), 'Cache-Control': 'no-cache'}
+    return StreamingResponse(events(), media_type=STREAM_MEDIA_TYPES[format], headers=headers)
+
+class BatchSearch(BaseModel):
+    city: str
+    query: str
+    max_price: int
+    limit: int = 8
+    # Filtered locally on the parsed listing fields; min_price is in max_price's units
+    min_price: Optional[int] = None
+    max_age_hours: Optional[float] = None
+
+class BatchCrawlRequest(BaseModel):
+    searches: List[BatchSearch]
+
+# Create a route to the batch crawl endpoint.
+@app.post("/crawl_facebook_marketplace/batch")
+async def crawl_facebook_marketplace_batch(request: BatchCrawlRequest):
+    """Crawl several searches in one request; returns results, timing and error per search"""
+    started = time.monotonic()
+    # Submit every search's crawls before awaiting any so the pool works on all of them at once
+    jobs = []
+    for search in request.searches:
+        try:
+            city = resolve_city(search.city)
+        except HTTPException as e:
+            jobs.append((search, None, None, None, e.detail))
+            continue
+        query_jobs, cache_statuses = start_query_crawls(city, [search.query], search.max_price, search.limit)
+        jobs.append((search, city, query_jobs[0], summarize_cache_statuses(cache_statuses), None))
+    timeout = CRAWL_JOB_TIMEOUT * math.ceil(2 * len(jobs) / WORKER_POOL_SIZE)
+
+    async def run_search(search, city, futures, cache_status, error):
+        search_started = time.monotonic()
+        entry = {'city': search.city, 'query': search.query, 'max_price': search.max_price, 'limit': search.limit,
+                 'min_price': search.min_price, 'max_age_hours': search.max_age_hours,
+                 'results': [], 'error': error, 'cache': cache_status, 'seconds': 0.0}
+        if error is not None:
+            return entry
+        try:
+            recent_query_results, suggested_results = await await_crawl_results(futures, timeout)
+            entry['results'] = await finish_query_results(city, search.query, recent_query_results, suggested_results,
+                                                          search.min_price, search.max_age_hours)
+        except asyncio.TimeoutError:
+            logger.error(f"Batch crawl of '{search.query}' timed out")
+            entry['error'] = 'Crawl timed out'
+        except Exception as e:
+            logger.error(f"Batch crawl of '{search.query}' failed: {e}")
+            entry['error'] = str(e)
+        entry['seconds'] = round(time.monotonic() - search_started, 3)
+        return entry
+
+    searches = await asyncio.gather(*(run_search(*job) for job in jobs))
+    return ListingJSONResponse({'searches': searches, 'seconds': round(time.monotonic() - started, 3)})
+
+def encode_stream_event(event, data, format):
+    """Encode one streaming event as an NDJSON line or a Server-Sent Event"""
+    if format == 'sse':
+        return b'event: ' + event.encode() + b'\ndata: ' + dump_json(data) + b'\n\n'
+    return dump_json({'event': event, **data}) + b'\n'
+
+def start_query_crawls(city, query_list, max_price, max_results):
+    """Get (recent, suggested) crawl futures for every query; returns (futures per query, cache statuses)"""
+    query_jobs = []
+    cache_statuses = []
+    for query in query_list:
+        futures = []
+        for suggested in (False, True):
+            future, cache_status = crawl_result_cache.get_future(city, query, max_price, max_results, suggested)
+            futures.append(future)
+            cache_statuses.append(cache_status)
+        query_jobs.append(futures)
+    return query_jobs, cache_statuses
+
+def cache_headers(cache_statuses):
+    """X-Cache headers summarizing how the result cache answered a request's crawls"""
+    return {
+        'X-Cache': summarize_cache_statuses(cache_statuses),
+        'X-Cache-Detail': ', '.join(f"{status.lower()}={cache_statuses.count(status)}" for status in CACHE_STATUSES),
+    }
+
+async def finish_query_results(city, query, recent_query_results, suggested_results, min_price=None, max_age_hours=None):
+    """Merge one query's crawls, remember the listings, filter them and send hot item notifications"""
+    consolidated_query_results = merge_query_results(query, recent_query_results, suggested_results)
+    await asyncio.to_thread(record_seen_listings, consolidated_query_results, city, query)
+    # Price floor and age cutoff run on the parsed fields; the crawl and its cache entry are shared
+    consolidated_query_results = filter_listings(consolidated_query_results, min_price=min_price, max_age_hours=max_age_hours)
+    listing_velocity.observe(city, query, [item.item_id for item in consolidated_query_results])
+
+    # Queue the email notification for HOT items; it is sent in the background
+    notify_hot_items(consolidated_query_results, query, city)
+    return consolidated_query_results
+
+async def filter_first_seen_since(results, since, cursor):
+    """Keep the listings first seen after the `since` cursor"""
+    first_seen = await asyncio.to_thread(
+        listing_store.load_first_seen, [item.item_id for item in results]
+    )
+    return [item for item in results if first_seen.get(item.item_id, cursor) > since]
+
+def resolve_city(city):
+    """Map a supported city name to its Facebook Marketplace location id"""
     # Define dictionary of cities from the facebook marketplace directory for United States.
     # https://m.facebook.com/marketplace/directory/US/?_se_imp=0oey5sMRMSl7wluQZ
     cities = {
@@ -342,103 +894,526 @@ def crawl_facebook_marketplace(city: str, query: str, max_price: int, max_result
     # If the city is in the cities dictionary...
     if city in cities:
         # Get the city location id from the cities dictionary.
-        city = cities[city]
+        return cities[city]
     # If the city is not in the cities dictionary...
-    else:
-        # Exit the script if the city is not in the cities dictionary.
-        # Capitalize only the first letter of the city.
-        city = city.capitalize()
-        # Raise an HTTPException.
-        raise HTTPException (404, f'{city} is not a city we are currently supporting on the Facebook Marketplace. Please reach out to us to add this city in our directory.')
-        
-    # Define the URL to scrape.
-    results = []
-    # Split the query into a list
-    query_list = query.split(',')
-    notified_items = load_notified_items()
-    for query in query_list:
-      try:
-        # Use the new robust crawling method
-        recent_query_results = crawl_query(city, query, max_price, max_results_per_query, False)
-        suggested_results = crawl_query(city, query, max_price, max_results_per_query, True)
-      except Exception as e:
-        logger.error(f"Error crawling query '{query}': {e}")
-        recent_query_results = []
-        suggested_results = []
-
-      # Extract item IDs for comparison instead of full URLs
-      recent_query_item_ids = {extract_item_id(item["link"]): item for item in recent_query_results if extract_item_id(item["link"])}
-      suggested_results_item_ids = {extract_item_id(item["link"]): item for item in suggested_results if extract_item_id(item["link"])}
-
-      # Find common items based on item IDs (not full URLs)
-      # TODO: this may not be grabbing from the latest input query?
-      common_item_ids = set(recent_query_item_ids.keys()) & set(suggested_results_item_ids.keys())
-      logger.info(f"Common item IDs for query '{query}': {list(common_item_ids)} (found {len(common_item_ids)} matches)")
-
-      # Add metadata to indicate item type based on new requirements:
-      # Priority order: 
-      # 1. HOT: Items in both recent AND suggested (common items)
-      # 2. NEW: Recent-only items with "just listed" pill
-      # 3. SUGGESTED: Suggested-only items without "just listed" pill
-      # 4. No badge: Recent-only items without "just listed" pill
-      
-      # First, assign basic types
-      for item in recent_query_results:
-        item_id = extract_item_id(item["link"])
-        if item_id in common_item_ids:
-          item["item_type"] = "hot"  # Items in both recent AND suggested = HOT
-        elif item.get('has_just_listed_pill', False):
-          item["item_type"] = "new"  # Recent-only with "just listed" pill
-        else:
-          item["item_type"] = "recent"  # Recent-only without "just listed" pill
-
-      for item in suggested_results:
-        item_id = extract_item_id(item["link"])
-        if item_id in common_item_ids:
-          item["item_type"] = "hot"  # Items in both recent AND suggested = HOT
-        elif item.get('has_just_listed_pill', False):
-          item["item_type"] = "hot"  # Suggested with "just listed" pill also = HOT
+    # Capitalize only the first letter of the city.
+    city = city.capitalize()
+    # Raise an HTTPException.
+    raise HTTPException (404, f'{city} is not a city we are currently supporting on the Facebook Marketplace. Please reach out to us to add this city in our directory.')
+
+def notify_hot_items(query_results, query, city):
+    """Queue an email for the HOT items of a query's merged results if any of them has not been notified about yet"""
+    hot_items = [item for item in query_results if item.item_type == 'hot']
+    new_hot_item_ids = [item.item_id for item in hot_items if not notified_items_cache.is_notified(item.item_id)]
+    if new_hot_item_ids:
+        # Marked right away so the next poll does not queue them again while the email is pending
+        notification_dispatcher.enqueue([item.to_dict() for item in hot_items], query, city)
+        add_notified_items(new_hot_item_ids)
+
+def merge_query_results(query, recent_query_results, suggested_results):
+    """Assign item types to one query's recent and suggested results and merge them by item ID"""
+    # Compare item IDs instead of full URLs
+    recent_query_item_ids = {item.item_id: item for item in recent_query_results if item.item_id}
+    suggested_results_item_ids = {item.item_id: item for item in suggested_results if item.item_id}
+
+    # Find common items based on item IDs (not full URLs)
+    common_item_ids = set(recent_query_item_ids.keys()) & set(suggested_results_item_ids.keys())
+    logger.info(f"Common item IDs for query '{query}': {list(common_item_ids)} (found {len(common_item_ids)} matches)")
+
+    # Add metadata to indicate item type based on new requirements:
+    # Priority order: 
+    # 1. HOT: Items in both recent AND suggested (common items)
+    # 2. NEW: Recent-only items with "just listed" pill
+    # 3. SUGGESTED: Suggested-only items without "just listed" pill
+    # 4. No badge: Recent-only items without "just listed" pill
+    
+    # First, assign basic types. Listings are immutable, so the typed copies never touch the cached crawl results.
+    typed_recent_results = []
+    for item in recent_query_results:
+      if item.item_id in common_item_ids:
+        item_type = "hot"  # Items in both recent AND suggested = HOT
+      elif item.has_just_listed_pill:
+        item_type = "new"  # Recent-only with "just listed" pill
+      else:
+        item_type = "recent"  # Recent-only without "just listed" pill
+      typed_recent_results.append(item.with_type(item_type))
+
+    typed_suggested_results = []
+    for item in suggested_results:
+      if item.item_id in common_item_ids:
+        item_type = "hot"  # Items in both recent AND suggested = HOT
+      elif item.has_just_listed_pill:
+        item_type = "hot"  # Suggested with "just listed" pill also = HOT
+      else:
+        item_type = "suggested"  # Suggested-only without "just listed" pill
+      typed_suggested_results.append(item.with_type(item_type))
+
+    # Create consolidated results using item IDs to avoid duplicates
+    all_items_by_id = {}
+    
+    # Add recent items first
+    for item in typed_recent_results:
+      if item.item_id:
+          all_items_by_id[item.item_id] = item
+    
+    # Add suggested items, but prefer hot items if they exist in both
+    for item in typed_suggested_results:
+      item_id = item.item_id
+      if item_id:
+          # If item exists in both recent and suggested, keep the one with higher priority
+          if item_id in all_items_by_id:
+              # If suggested item is hot, or if existing item isn't hot/new, replace it
+              existing_type = all_items_by_id[item_id].item_type
+              suggested_type = item.item_type
+              
+              if suggested_type == "hot" or (existing_type not in ["hot", "new"] and suggested_type in ["hot", "suggested"]):
+                  all_items_by_id[item_id] = item
+          else:
+              all_items_by_id[item_id] = item
+
+    # Convert back to list
+    return list(all_items_by_id.values())
+
+# Scheduled watcher: the API process crawls saved searches on its own schedule and
+# stores their latest results, so the GUI only has to read them.
+DEFAULT_SEARCH_INTERVAL_SECONDS = float(os.getenv('DEFAULT_SEARCH_INTERVAL_SECONDS', '180'))
+DEFAULT_SEARCH_JITTER_SECONDS = float(os.getenv('DEFAULT_SEARCH_JITTER_SECONDS', '20'))
+# Floor for a single search interval, after jitter
+MIN_SEARCH_INTERVAL_SECONDS = 30
+# How often the scheduler checks for due searches
+SCHEDULER_TICK_SECONDS = 1.0
+# Shared crawls: due searches in the same city with the same search terms are served by
+# one crawl at the highest max_price, then filtered per search.
+SHARED_CRAWLS_ENABLED = os.getenv('SHARED_CRAWLS_ENABLED', 'true').lower() == 'true'
+# Searches due within this many seconds may run early to join a shared crawl
+SHARED_CRAWL_WINDOW_SECONDS = float(os.getenv('SHARED_CRAWL_WINDOW_SECONDS', '30'))
+# Scheduling cycles kept for the shared crawl stats
+SHARED_CRAWL_HISTORY = 50
+
+class SavedSearchRequest(BaseModel):
+    city: str
+    # Comma-separated queries create one saved search per query
+    query: str
+    max_price: int
+    max_results: int = 8
+    interval_seconds: float = DEFAULT_SEARCH_INTERVAL_SECONDS
+    jitter_seconds: float = DEFAULT_SEARCH_JITTER_SECONDS
+    # Let the observed listing velocity move the interval between the adaptive bounds
+    adaptive: bool = True
+    # Filtered locally on the parsed listing fields; min_price is in max_price's units
+    min_price: Optional[int] = None
+    max_age_hours: Optional[float] = None
+    # Seconds the search is kept unless it is saved again; None keeps it until deleted
+    lease_seconds: Optional[float] = None
+
+# Adaptive polling: searches that get new listings often are polled more often, quiet
+# ones back off, always within these bounds.
+ADAPTIVE_MIN_INTERVAL_SECONDS = float(os.getenv('ADAPTIVE_MIN_INTERVAL_SECONDS', '60'))
+ADAPTIVE_MAX_INTERVAL_SECONDS = float(os.getenv('ADAPTIVE_MAX_INTERVAL_SECONDS', '1800'))
+# Aim for about this many new listings per poll
+ADAPTIVE_TARGET_NEW_PER_POLL = float(os.getenv('ADAPTIVE_TARGET_NEW_PER_POLL', '1'))
+# Weight of the latest poll in the smoothed arrival rate
+VELOCITY_SMOOTHING = 0.3
+# Item IDs remembered per search to tell new listings from ones already seen
+VELOCITY_SEEN_IDS_PER_SEARCH = 1000
+
+class ListingVelocityTracker:
+    """Tracks how fast new item IDs show up for each (city, query)"""
+
+    def __init__(self):
+        # (city, query) -> {'seen_ids', 'rate', 'last_observed_at', 'observations'}
+        self._searches = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(city, query):
+        return (city, query.strip().lower())
+
+    def observe(self, city, query, item_ids):
+        """Record the item IDs of one poll; returns how many were new"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._searches.setdefault(self.make_key(city, query), {
+                'seen_ids': OrderedDict(), 'rate': 0.0, 'last_observed_at': None, 'observations': 0, 'quiet_polls': 0,
+            })
+            seen_ids = state['seen_ids']
+            new_count = 0
+            for item_id in item_ids:
+                if not item_id:
+                    continue
+                if item_id in seen_ids:
+                    seen_ids.move_to_end(item_id)
+                else:
+                    seen_ids[item_id] = True
+                    new_count += 1
+            while len(seen_ids) > VELOCITY_SEEN_IDS_PER_SEARCH:
+                seen_ids.popitem(last=False)
+
+            # Repeats served from the crawl result cache carry no new information
+            if (not new_count and state['last_observed_at'] is not None
+                    and now - state['last_observed_at'] < CRAWL_CACHE_TTL_SECONDS):
+                return 0
+
+            # The first poll only sets the baseline; everything on it looks new
+            if state['last_observed_at'] is not None:
+                elapsed = max(now - state['last_observed_at'], 1.0)
+                state['rate'] = VELOCITY_SMOOTHING * (new_count / elapsed) + (1 - VELOCITY_SMOOTHING) * state['rate']
+                state['quiet_polls'] = 0 if new_count else state['quiet_polls'] + 1
+            state['last_observed_at'] = now
+            state['observations'] += 1
+            return new_count
+
+    def suggested_interval(self, city, query, default_interval):
+        """Polling interval that should catch about ADAPTIVE_TARGET_NEW_PER_POLL new listings per poll"""
+        with self._lock:
+            state = self._searches.get(self.make_key(city, query))
+            if state is None or state['observations'] < 2:
+                return default_interval
+            rate = state['rate']
+            quiet_polls = state['quiet_polls']
+        if rate > 0:
+            interval = ADAPTIVE_TARGET_NEW_PER_POLL / rate
         else:
-          item["item_type"] = "suggested"  # Suggested-only without "just listed" pill
-
-      # Create consolidated results using item IDs to avoid duplicates
-      all_items_by_id = {}
-      
-      # Add recent items first
-      for item in recent_query_results:
-        item_id = extract_item_id(item["link"])
-        if item_id:
-            all_items_by_id[item_id] = item
-      
-      # Add suggested items, but prefer hot items if they exist in both
-      for item in suggested_results:
-        item_id = extract_item_id(item["link"])
-        if item_id:
-            # If item exists in both recent and suggested, keep the one with higher priority
-            if item_id in all_items_by_id:
-                # If suggested item is hot, or if existing item isn't hot/new, replace it
-                existing_type = all_items_by_id[item_id].get("item_type", "")
-                suggested_type = item.get("item_type", "")
-                
-                if suggested_type == "hot" or (existing_type not in ["hot", "new"] and suggested_type in ["hot", "suggested"]):
-                    all_items_by_id[item_id] = item
-            else:
-                all_items_by_id[item_id] = item
+            # Nothing new has ever shown up: back off by doubling per quiet poll
+            interval = default_interval * 2 ** min(quiet_polls, 16)
+        return min(max(interval, ADAPTIVE_MIN_INTERVAL_SECONDS), ADAPTIVE_MAX_INTERVAL_SECONDS)
 
-      # Convert back to list
-      consolidated_query_results = list(all_items_by_id.values())
-      
-      results.extend(consolidated_query_results)
+    def stats(self, city, query):
+        with self._lock:
+            state = self._searches.get(self.make_key(city, query))
+            if state is None:
+                return {'observations': 0, 'new_per_hour': 0.0}
+            return {'observations': state['observations'], 'new_per_hour': round(state['rate'] * 3600, 2)}
 
-      # Send email notification for HOT items
-      hot_items = [item for item in suggested_results if item.get('item_type') == 'hot']
-      new_hot_item_ids = [extract_item_id(item["link"]) for item in hot_items if extract_item_id(item["link"]) not in notified_items]
-      if new_hot_item_ids:
-          send_hot_item_email(hot_items, query, city)
-          add_notified_items(new_hot_item_ids)
+listing_velocity = ListingVelocityTracker()
 
+class SearchScheduler:
+    """Background scheduler that runs saved searches on the worker pool"""
+
+    def __init__(self, store):
+        self.store = store
+        # search_id -> saved search
+        self._searches = {}
+        # search_id -> monotonic time of the next run
+        self._next_run = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._executor = None
+        # Recent scheduling cycles and the browser navigations shared crawls saved in them
+        self._cycles = deque(maxlen=SHARED_CRAWL_HISTORY)
+        self._navigations_saved = 0
+
+    def start(self):
+        """Load the saved searches and start the scheduling thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        now = time.monotonic()
+        with self._lock:
+            for search in self.store.load_saved_searches():
+                self._searches[search['search_id']] = search
+                # Spread the first runs out instead of crawling everything at once
+                self._next_run[search['search_id']] = now + random.uniform(0, search['jitter_seconds'])
+        self._stop_event.clear()
+        # Searches only wait on the worker pool, so one thread per browser worker is enough
+        self._executor = ThreadPoolExecutor(max_workers=WORKER_POOL_SIZE, thread_name_prefix='saved-search')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def add_search(self, city, query, max_price, max_results, interval_seconds, jitter_seconds, adaptive=True,
+                   min_price=None, max_age_hours=None, lease_seconds=None):
+        """Save a search (or update an identical one, renewing its lease) and schedule it"""
+        search = self.store.save_search(city, query, max_price, max_results, interval_seconds, jitter_seconds, adaptive,
+                                        min_price, max_age_hours, lease_seconds)
+        with self._lock:
+            is_new = search['search_id'] not in self._searches
+            self._searches[search['search_id']] = search
+            if is_new:
+                # Run a new search right away
+                self._next_run[search['search_id']] = time.monotonic()
+        return search
+
+    def remove_search(self, search_id):
+        with self._lock:
+            self._searches.pop(search_id, None)
+            self._next_run.pop(search_id, None)
+        return self.store.delete_saved_search(search_id)
+
+    def list_searches(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                dict(search,
+                     next_run_in_seconds=round(max(self._next_run.get(search_id, now) - now, 0), 1),
+                     running=search_id in self._running,
+                     current_interval_seconds=round(self._base_interval(search), 1),
+                     velocity=listing_velocity.stats(search['city'], search['query']))
+                for search_id, search in self._searches.items()
+            ]
+
+    def _base_interval(self, search):
+        if search['adaptive']:
+            return listing_velocity.suggested_interval(search['city'], search['query'], search['interval_seconds'])
+        return search['interval_seconds']
+
+    def _next_interval(self, search):
+        jitter = random.uniform(-search['jitter_seconds'], search['jitter_seconds'])
+        return max(self._base_interval(search) + jitter, MIN_SEARCH_INTERVAL_SECONDS)
+
+    @property
+    def stats(self):
+        """Browser navigations saved by shared crawls, in total and per recent scheduling cycle"""
+        with self._lock:
+            return {
+                'enabled': SHARED_CRAWLS_ENABLED,
+                'navigations_saved': self._navigations_saved,
+                'recent_cycles': list(self._cycles),
+            }
+
+    def _expire_leases(self):
+        """Remove the leased searches no client renewed in time"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                search for search_id, search in self._searches.items()
+                if search['lease_expires_at'] is not None and search['lease_expires_at'] < now and search_id not in self._running
+            ]
+        for search in expired:
+            search_id = search['search_id']
+            # The store only deletes the search if no client renewed the lease meanwhile
+            if self.store.delete_saved_search(search_id, lease_expired_before=now):
+                logger.info(f"Lease of saved search {search_id} ('{search['query']}') expired, removed it")
+                with self._lock:
+                    self._searches.pop(search_id, None)
+                    self._next_run.pop(search_id, None)
+
+    def _plan_due_searches(self, now):
+        """Take the due searches (and the ones that can join their crawls early) and plan their crawls"""
+        idle = {search_id: search for search_id, search in self._searches.items() if search_id not in self._running}
+        due = [search for search_id, search in idle.items() if self._next_run.get(search_id, now) <= now]
+        if not due or not SHARED_CRAWLS_ENABLED:
+            return [single_search_plan(search) for search in due]
+        due_ids = {search['search_id'] for search in due}
+        upcoming = [
+            search for search_id, search in idle.items()
+            if search_id not in due_ids and self._next_run.get(search_id, now) <= now + SHARED_CRAWL_WINDOW_SECONDS
+        ]
+        # Upcoming searches only run now when they share a crawl with a due one
+        return [
+            plan for plan in plan_shared_crawls(due + upcoming)
+            if any(search['search_id'] in due_ids for search in plan['searches'])
+        ]
+
+    def _record_cycle(self, plans):
+        searches = sum(len(plan['searches']) for plan in plans)
+        # Every search would have loaded a recent and a suggested page on its own
+        saved = 2 * (searches - len(plans))
+        self._navigations_saved += saved
+        cycle = {
+            'timestamp': datetime.now().timestamp(),
+            'searches': searches,
+            'crawls': len(plans),
+            'fallback_crawls': 0,
+            'navigations_saved': saved,
+        }
+        self._cycles.append(cycle)
+        for plan in plans:
+            plan['cycle'] = cycle
+        if saved:
+            logger.info(f"Scheduled {searches} saved searches as {len(plans)} crawls, saving {saved} browser navigations")
+
+    def _record_fallback(self, plan):
+        """A search in a shared crawl needed its own crawl after all"""
+        with self._lock:
+            self._navigations_saved -= 2
+            if 'cycle' in plan:
+                plan['cycle']['fallback_crawls'] += 1
+                plan['cycle']['navigations_saved'] -= 2
+
+    def _run(self):
+        logger.info("Saved search scheduler started")
+        while not self._stop_event.wait(SCHEDULER_TICK_SECONDS):
+            self._expire_leases()
+            now = time.monotonic()
+            with self._lock:
+                plans = self._plan_due_searches(now)
+                for plan in plans:
+                    for search in plan['searches']:
+                        self._running.add(search['search_id'])
+                if plans:
+                    self._record_cycle(plans)
+            for plan in plans:
+                try:
+                    self._executor.submit(self._run_plan, plan)
+                except RuntimeError:
+                    # Executor already shut down
+                    return
+        logger.info("Saved search scheduler stopped")
+
+    def _run_plan(self, plan):
+        try:
+            try:
+                crawl_results = run_crawl_plan(plan)
+            except Exception as e:
+                # The shared crawl failed: every search in it failed
+                crawl_results = None
+                crawl_error = e
+            for search in plan['searches']:
+                if crawl_results is None:
+                    self._store_failure(search, crawl_error)
+                    continue
+                try:
+                    search_results = crawl_results
+                    if len(plan['searches']) > 1:
+                        search_results = select_shared_results(search, plan, crawl_results)
+                        if search_results is None:
+                            # The shared crawl cannot stand in for this search's own crawl
+                            self._record_fallback(plan)
+                            search_results = run_crawl_plan(single_search_plan(search))
+                    results = finish_saved_search(search, *search_results)
+                    self.store.save_search_results(search['search_id'], [item.to_dict() for item in results])
+                except Exception as e:
+                    self._store_failure(search, e)
+        finally:
+            with self._lock:
+                for search in plan['searches']:
+                    search_id = search['search_id']
+                    self._running.discard(search_id)
+                    if search_id in self._searches:
+                        self._next_run[search_id] = time.monotonic() + self._next_interval(search)
+
+    def _store_failure(self, search, error):
+        search_id = search['search_id']
+        logger.error(f"Saved search {search_id} ('{search['query']}') failed: {error}")
+        try:
+            # The last good results stay; the velocity tracker never sees the failed poll
+            self.store.save_search_error(search_id, str(error))
+        except Exception as store_error:
+            logger.error(f"Error storing failure of saved search {search_id}: {store_error}")
+
+def single_search_plan(search):
+    """Crawl plan of a search that does not share its crawl"""
+    return {'city': search['city'], 'query': search['query'], 'max_price': search['max_price'],
+            'max_results': search['max_results'], 'searches': [search]}
+
+def plan_shared_crawls(searches):
+    """Group saved searches into as few crawls as possible; returns the crawl plans
+
+    Searches share a crawl when they are in the same city and search for the same terms;
+    they may differ in max_price, negative terms, result count and filters. The crawl runs
+    at the highest max_price of the group with room for every search's results, and every
+    search filters its own share out of them.
+    """
+    groups = {}
+    plans = []
+    for search in searches:
+        matcher = compile_query(search['query'])
+        if not matcher.terms:
+            # Searches with only negative terms keep their own crawl
+            plans.append(single_search_plan(search))
+            continue
+        key = (search['city'], frozenset(matcher.terms))
+        groups.setdefault(key, []).append(search)
+
+    for group in groups.values():
+        if len(group) == 1:
+            plans.append(single_search_plan(group[0]))
+            continue
+        plans.append({
+            'city': group[0]['city'],
+            'query': compile_query(group[0]['query']).search_query,
+            'max_price': max(search['max_price'] for search in group),
+            # At the highest max_price alone, a cheaper search's listings would be crowded out
+            # by pricier ones and it would need a crawl of its own anyway
+            'max_results': sum(search['max_results'] for search in group),
+            'searches': group,
+        })
+    return plans
+
+def run_crawl_plan(plan):
+    """Crawl a plan on the worker pool; returns its (recent, suggested) results"""
+    futures = [
+        # A stale result would hold back this poll's new listings until the next one
+        crawl_result_cache.get_future(plan['city'], plan['query'], plan['max_price'], plan['max_results'], suggested, allow_stale=False)[0]
+        for suggested in (False, True)
+    ]
+    # A failed crawl raises, so the scheduler keeps the searches' previous results
+    return wait_for_crawl_result(futures[0], raise_errors=True), wait_for_crawl_result(futures[1], raise_errors=True)
+
+def select_search_listings(search, listings):
+    """A search's share of a shared crawl: its query, price cap and result count"""
+    matcher = compile_query(search['query'])
+    if RELEVANCE_RANKING_ENABLED:
+        listings = matcher.rank(listings, title=lambda item: item.title)
+    else:
+        listings = [item for item in listings if matcher.matches(item.title)]
+    # The crawl ran at the group's highest max_price; the card prices tell what this search allows
+    return filter_listings(listings, max_price=search['max_price'])[:search['max_results']]
+
+def select_shared_results(search, plan, crawl_results):
+    """A search's share of a shared crawl's (recent, suggested) results
+
+    Returns None when the crawl may have cut off listings this search would have found:
+    it came back full, but fewer of its listings are within the search's price and query.
+    """
+    selected = []
+    for listings in crawl_results:
+        share = select_search_listings(search, listings)
+        if len(share) < search['max_results'] and len(listings) >= plan['max_results']:
+            return None
+        selected.append(share)
+    return selected
+
+def finish_saved_search(search, recent_query_results, suggested_results):
+    """Merge a saved search's crawl results, remember them and send hot item notifications"""
+    city, query = search['city'], search['query']
+    results = merge_query_results(query, recent_query_results, suggested_results)
+    record_seen_listings(results, city, query)
+    results = filter_listings(results, min_price=search['min_price'], max_age_hours=search['max_age_hours'])
+    listing_velocity.observe(city, query, [item.item_id for item in results])
+    notify_hot_items(results, query, city)
     return results
 
+# Create a route to save searches for the scheduler.
+@app.post("/saved_searches")
+def create_saved_searches(request: SavedSearchRequest):
+    # Validate the city and save one search per comma-separated query.
+    city = resolve_city(request.city)
+    return [
+        search_scheduler.add_search(city, query.strip(), request.max_price, request.max_results,
+                                    request.interval_seconds, request.jitter_seconds, request.adaptive,
+                                    request.min_price, request.max_age_hours, request.lease_seconds)
+        for query in request.query.split(',') if query.strip()
+    ]
+
+# Create a route to list the saved searches and their schedule.
+@app.get("/saved_searches")
+def list_saved_searches():
+    return search_scheduler.list_searches()
+
+# Create a route to delete a saved search.
+@app.delete("/saved_searches/{search_id}")
+def delete_saved_search(search_id: int):
+    if not search_scheduler.remove_search(search_id):
+        raise HTTPException(404, f'Saved search {search_id} does not exist.')
+    return {"deleted": search_id}
+
+# Create a route to read the latest results of a saved search.
+@app.get("/saved_searches/{search_id}/results")
+def saved_search_results(search_id: int):
+    stored = listing_store.load_search_results([search_id])
+    if search_id not in stored:
+        raise HTTPException(404, f'Saved search {search_id} has no results yet.')
+    return stored[search_id]
+
 if __name__ == "__main__":
 
     # Run the app.
@@ -449,88 +1424,365 @@ if __name__ == "__main__":
         port=8000
     )
 
-def crawl_query(city: str, query: str, max_price: int, max_results: int, suggested: bool):
-    """Submit crawl job to worker thread and wait for result"""
-    job_id = str(uuid.uuid4())
-    result_queue = queue.Queue()
-    result_queues[job_id] = result_queue
-    
+def submit_crawl_job(city: str, query: str, max_price: int, max_results: int, suggested: bool):
+    """Queue a crawl job for the worker pool and return a Future for its results"""
+    future = Future()
+    job = {
+        'job_id': str(uuid.uuid4()),
+        'action': 'crawl',
+        'city': city,
+        'query': query,
+        'max_price': max_price,
+        'max_results': max_results,
+        'suggested': suggested,
+        'future': future
+    }
+    job_queue.put(job)
+    return future
+
+def wait_for_crawl_result(future, timeout=CRAWL_JOB_TIMEOUT, raise_errors=False):
+    """Wait for a submitted crawl job and return its results, or [] on failure
+
+    With raise_errors, a timeout or failed crawl raises instead, so callers that keep
+    earlier results can tell a failure from a search without listings.
+    """
     try:
-        # Submit job to worker thread
-        job = {
-            'job_id': job_id,
-            'action': 'crawl',
-            'city': city,
-            'query': query,
-            'max_price': max_price,
-            'max_results': max_results,
-            'suggested': suggested
-        }
-        
-        job_queue.put(job)
-        
-        # Wait for result with timeout
-        try:
-            result = result_queue.get(timeout=120)  # 2 minute timeout
-            if result['success']:
-                return result['data']
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # Drop the job if no worker has picked it up yet
+        future.cancel()
+        logger.error("Crawl job timed out")
+        if raise_errors:
+            raise TimeoutError("Crawl timed out")
+        return []
+    except Exception as e:
+        logger.error(f"Crawl failed: {e}")
+        if raise_errors:
+            raise
+        return []
+
+# Crawl result cache: repeated polls with the same parameters reuse recent results
+# instead of launching new browser crawls.
+# Seconds a cached result is served as fresh
+CRAWL_CACHE_TTL_SECONDS = float(os.getenv('CRAWL_CACHE_TTL_SECONDS', '60'))
+# Seconds past the TTL a stale result is still served while a background crawl refreshes it
+CRAWL_CACHE_STALE_SECONDS = float(os.getenv('CRAWL_CACHE_STALE_SECONDS', '120'))
+# Maximum number of (city, query, max_price, mode) entries kept, least recently used evicted first
+CRAWL_CACHE_MAX_ENTRIES = int(os.getenv('CRAWL_CACHE_MAX_ENTRIES', '256'))
+# HIT: fresh cached result, STALE: stale result served while refreshing,
+# COALESCED: joined an identical crawl already running, MISS: started a new crawl
+CACHE_STATUSES = ['HIT', 'STALE', 'COALESCED', 'MISS']
+
+class CrawlResultCache:
+    """LRU cache of crawl results with TTL, in-flight coalescing and stale-while-revalidate"""
+
+    def __init__(self, ttl=CRAWL_CACHE_TTL_SECONDS, stale_ttl=CRAWL_CACHE_STALE_SECONDS, max_entries=CRAWL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        # key -> {'results', 'max_results', 'fetched_at'}, least recently used first
+        self._entries = OrderedDict()
+        # key -> (Future of the running crawl, max_results it was started with)
+        self._in_flight = {}
+        # Future of a running crawl -> callers still waiting on it; when the last one gives up
+        # the crawl is cancelled, which drops it if no worker has picked it up yet
+        self._waiters = {}
+        # Re-entrant: a crawl that finishes immediately runs its callback while the lock is held
+        self._lock = threading.RLock()
+        self.counts = {status: 0 for status in CACHE_STATUSES}
+
+    @staticmethod
+    def make_key(city, query, max_price, suggested):
+        return (city, query.strip().lower(), max_price, suggested)
+
+    def get_future(self, city, query, max_price, max_results, suggested, allow_stale=True):
+        """Return (Future of the crawl results, cache status)
+
+        Without allow_stale, a result past its TTL is a miss instead of being served while
+        it refreshes, for callers that poll on their own schedule and need this poll's listings.
+        """
+        key = self.make_key(city, query, max_price, suggested)
+        with self._lock:
+            entry = self._entries.get(key)
+            # A cached crawl with fewer results than requested cannot answer the request
+            if entry is not None and entry['max_results'] >= max_results:
+                age = time.monotonic() - entry['fetched_at']
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    return self._resolved(entry['results'], max_results, 'HIT')
+                if allow_stale and age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    if key not in self._in_flight:
+                        # Nobody waits on the refresh, so it is never cancelled for lack of waiters
+                        self._start_crawl(key, city, query, max_price, entry['max_results'], suggested, pinned=True)
+                    return self._resolved(entry['results'], max_results, 'STALE')
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None and in_flight[1] >= max_results:
+                self.counts['COALESCED'] += 1
+                return self._derived(in_flight[0], max_results), 'COALESCED'
+
+            self.counts['MISS'] += 1
+            source = self._start_crawl(key, city, query, max_price, max_results, suggested)
+            return self._derived(source, max_results), 'MISS'
+
+    def _resolved(self, results, max_results, status):
+        self.counts[status] += 1
+        future = Future()
+        future.set_result(copy_results(results, max_results))
+        return future, status
+
+    def _start_crawl(self, key, city, query, max_price, max_results, suggested, pinned=False):
+        """Submit a crawl and store its results when it finishes. Called with the lock held."""
+        source = submit_crawl_job(city, query, max_price, max_results, suggested)
+        self._in_flight[key] = (source, max_results)
+        self._waiters[source] = 1 if pinned else 0
+
+        def store_result(done):
+            with self._lock:
+                self._waiters.pop(done, None)
+                if self._in_flight.get(key, (None,))[0] is done:
+                    del self._in_flight[key]
+                # Failed crawls are not cached, the next request retries
+                if done.cancelled() or done.exception() is not None:
+                    return
+                self._entries[key] = {'results': done.result(), 'max_results': max_results, 'fetched_at': time.monotonic()}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        source.add_done_callback(store_result)
+        return source
+
+    def _derived(self, source, max_results):
+        """A Future with this caller's own copy of the source Future's results. Called with the lock held."""
+        future = Future()
+        self._waiters[source] = self._waiters.get(source, 0) + 1
+
+        def release(derived):
+            # The caller gave up (timeout, disconnected client): let go of the crawl
+            if derived.cancelled():
+                self._release(source)
+
+        def forward(done):
+            if future.cancelled():
+                return
+            if done.cancelled():
+                future.cancel()
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
             else:
-                logger.error(f"Crawl failed: {result['error']}")
-                return []
-        except queue.Empty:
-            logger.error("Crawl job timed out")
-            return []
-            
+                future.set_result(copy_results(done.result(), max_results))
+
+        future.add_done_callback(release)
+        source.add_done_callback(forward)
+        return future
+
+    def _release(self, source):
+        with self._lock:
+            if source not in self._waiters:
+                # Already finished
+                return
+            self._waiters[source] -= 1
+            if self._waiters[source] > 0:
+                return
+            # Only succeeds while the job is still queued; a crawl already running finishes and is
+            # cached. Cancelled under the lock so no new caller can join the crawl in between.
+            source.cancel()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'in_flight': len(self._in_flight), **{status.lower(): count for status, count in self.counts.items()}}
+
+def copy_results(results, max_results):
+    """A caller's own result list; the Listing records in it are immutable and shared with the cache"""
+    return list(results[:max_results])
+
+def summarize_cache_statuses(statuses):
+    """Collapse the per-crawl cache statuses of a request into a single X-Cache value"""
+    if all(status == 'HIT' for status in statuses):
+        return 'HIT'
+    if all(status in ('HIT', 'STALE') for status in statuses):
+        return 'STALE'
+    if all(status in ('MISS', 'COALESCED') for status in statuses):
+        return 'MISS'
+    return 'PARTIAL'
+
+crawl_result_cache = CrawlResultCache()
+
+async def await_crawl_result(future, timeout=CRAWL_JOB_TIMEOUT):
+    """Await a submitted crawl job from the event loop; a timeout or failed crawl is logged and raised"""
+    try:
+        # Cancelling the wrapped future (timeout, cancelled task) releases this caller's hold on
+        # the crawl; the cache drops a queued job once none of its callers waits for it any more
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        logger.error("Crawl job timed out")
+        raise
+    except Exception as e:
+        logger.error(f"Crawl failed: {e}")
+        raise
+
+async def await_crawl_results(futures, timeout=CRAWL_JOB_TIMEOUT):
+    """Await several crawl jobs; the first failure cancels the other waits and is raised"""
+    waits = [asyncio.ensure_future(await_crawl_result(future, timeout)) for future in futures]
+    try:
+        return await asyncio.gather(*waits)
     finally:
-        # Clean up result queue
-        if job_id in result_queues:
-            del result_queues[job_id]
+        # No-op for finished waits; the others let go of their crawls
+        for wait in waits:
+            wait.cancel()
+
+async def wait_for_crawl_result_async(future, timeout=CRAWL_JOB_TIMEOUT):
+    """Await a submitted crawl job from the event loop, returning [] on failure"""
+    try:
+        return await await_crawl_result(future, timeout)
+    except Exception:
+        return []
+
+# Incremental crawls: recent results are sorted newest first, so a repeat poll only
+# extracts the listings above the ones the previous crawl of the same search saw.
+INCREMENTAL_CRAWL_ENABLED = os.getenv('INCREMENTAL_CRAWL_ENABLED', 'true').lower() == 'true'
+# Seconds between full crawls of a search, which refresh the pills of older listings
+INCREMENTAL_FULL_REFRESH_SECONDS = float(os.getenv('INCREMENTAL_FULL_REFRESH_SECONDS', '900'))
+# Item IDs remembered per search as the high-water mark
+HIGH_WATER_MARK_MAX_IDS = 500
+
+class CrawlHighWaterMarks:
+    """Per-search item IDs and results of the last recent crawl, for incremental crawls"""
 
-def crawl_query_worker(city: str, query: str, max_price: int, max_results: int, suggested: bool):
+    def __init__(self):
+        # (city, query, max_price) -> {'known_ids', 'results', 'max_results', 'full_crawl_at'}
+        self._marks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(city, query, max_price):
+        return (city, query.strip().lower(), max_price)
+
+    def known_ids(self, city, query, max_price, max_results):
+        """Item IDs an incremental crawl can stop at, or None when a full crawl is due"""
+        with self._lock:
+            mark = self._marks.get(self.make_key(city, query, max_price))
+            if mark is None or mark['max_results'] < max_results:
+                return None
+            if time.monotonic() - mark['full_crawl_at'] > INCREMENTAL_FULL_REFRESH_SECONDS:
+                return None
+            return mark['known_ids']
+
+    def update(self, city, query, max_price, max_results, extracted_ids, new_results, incremental):
+        """Record a crawl and return its full result list, ordered like a full crawl's"""
+        key = self.make_key(city, query, max_price)
+        with self._lock:
+            mark = self._marks.get(key)
+            if incremental and mark is not None:
+                new_links = {item.link for item in new_results}
+                results = new_results + [item for item in mark['results'] if item.link not in new_links]
+                if RELEVANCE_RANKING_ENABLED:
+                    # Rank before cutting to max_results, as a full crawl does; the known IDs
+                    # keep a dropped listing from ever coming back, so it must be the worst one
+                    results = compile_query(query).rank(results, title=lambda item: item.title)
+                known_ids = list(extracted_ids) + [item_id for item_id in mark['known_ids'] if item_id not in extracted_ids]
+                full_crawl_at = mark['full_crawl_at']
+            else:
+                results = new_results
+                known_ids = list(extracted_ids)
+                full_crawl_at = time.monotonic()
+            results = results[:max_results]
+            self._marks[key] = {
+                'known_ids': known_ids[:HIGH_WATER_MARK_MAX_IDS],
+                'results': results,
+                'max_results': max_results,
+                'full_crawl_at': full_crawl_at,
+            }
+            return list(results)
+
+crawl_high_water_marks = CrawlHighWaterMarks()
+
+def truncate_at_known_ids(listings, known_ids):
+    """Keep the listings above the first one whose item ID is already known"""
+    if not known_ids:
+        return listings
+    for index, listing in enumerate(listings):
+        if listing_item_id(listing) in known_ids:
+            return listings[:index]
+    return listings
+
+def listing_is_complete(listing):
+    return listing['title'] is not None and listing['post_url'] is not None and listing['image'] is not None
+
+def listing_matches_query(listing, matcher):
+    """A listing is kept when it is complete and its title matches the query"""
+    return listing_is_complete(listing) and matcher.matches(listing['title'])
+
+def listing_item_id(listing):
+    """Item ID of an extracted listing record"""
+    return listing.get('item_id') or extract_item_id(listing['post_url'])
+
+# Order matching listings by relevance to the query before keeping max_results of them;
+# when false they keep the page order (newest first for recent searches)
+RELEVANCE_RANKING_ENABLED = os.getenv('RELEVANCE_RANKING_ENABLED', 'true').lower() == 'true'
+
+def crawl_query(city: str, query: str, max_price: int, max_results: int, suggested: bool):
+    """Submit crawl job to the worker pool and wait for result"""
+    return wait_for_crawl_result(submit_crawl_job(city, query, max_price, max_results, suggested))
+
+def crawl_query_worker(worker, city: str, query: str, max_price: int, max_results: int, suggested: bool):
     """Actual crawl implementation running in worker thread"""
-    global page
     try:
-        marketplace_url = f'https://www.facebook.com/marketplace/{city}/search?query={query}&maxPrice={max_price}&daysSinceListed=1&sortBy=creation_time_descend'
+        # Tokenized once per distinct query; negative terms are only applied locally
+        matcher = compile_query(query)
+        search_query = matcher.search_query
+        marketplace_url = f'https://www.facebook.com/marketplace/{city}/search?query={search_query}&maxPrice={max_price}&daysSinceListed=1&sortBy=creation_time_descend'
         initial_url = "https://www.facebook.com/login/device-based/regular/login/"
         if suggested:
-            marketplace_url = f'https://www.facebook.com/marketplace/{city}/search?query={query}&maxPrice={max_price}&daysSinceListed=3'
+            marketplace_url = f'https://www.facebook.com/marketplace/{city}/search?query={search_query}&maxPrice={max_price}&daysSinceListed=3'
 
         logger.info(f"Crawling URL: {marketplace_url} (suggested={suggested})")
-        login_and_goto_marketplace_worker(initial_url, marketplace_url)
-        
-        # Get listings of particular item in a particular city for a particular price.
-        # Wait for the page to load.
-        time.sleep(5)
-        html = page.content()
-        soup = BeautifulSoup(html, 'html.parser')
-        parsed = []
-        
-        # More robust approach: Use multiple selectors as fallbacks
-        listings = find_marketplace_listings(soup)
-
-        for listing in listings:
-            # Get the item image using multiple strategies
-            image = find_listing_image(listing)
+        crawl_started = time.monotonic()
+        # Wall clock the relative listing ages are counted back from
+        crawl_started_at = time.time()
+        worker.reset_resource_stats()
+        # Capture the search GraphQL responses while the page loads
+        graphql_collector = None
+        if EXTRACTION_MODE == 'graphql':
+            graphql_collector = GraphQLResponseCollector()
+            graphql_collector.attach(worker.page)
+        try:
+            login_and_goto_marketplace_worker(worker, initial_url, marketplace_url)
             
-            # Get the item title using multiple strategies
-            title = find_listing_title(listing)
+            # Get listings of particular item in a particular city for a particular price.
+            # Wait for the listings grid to render and settle.
+            navigated = time.monotonic()
+            readiness = wait_for_listings_ready(worker.page)
+        finally:
+            if graphql_collector is not None:
+                graphql_collector.detach()
+        # Repeat polls of a recent search stop extracting at the first listing seen last time
+        known_ids = None
+        if INCREMENTAL_CRAWL_ENABLED and not suggested:
+            known_ids = crawl_high_water_marks.known_ids(city, query, max_price, max_results)
+        parse_started = time.monotonic()
+        listings, extraction_mode, bytes_transferred = extract_listings_from_page(
+            worker.page, graphql_collector, set(known_ids) if known_ids else None
+        )
+        parse_seconds = time.monotonic() - parse_started
 
-            # Get the item URL using multiple strategies
-            post_url = find_listing_url(listing)
+        # Scroll only when more listings are requested than the first screen holds; a niche
+        # query with few matches on a full first screen would only scroll into unrelated
+        # results. Incremental polls stop at the top.
+        scroll_steps = 0
+        scroll_started = time.monotonic()
+        if SCROLL_HARVEST_ENABLED and known_ids is None and listings and max_results > len(listings):
+            listings, scroll_steps = scroll_and_harvest(worker.page, listings, matcher, max_results)
+        scroll_seconds = time.monotonic() - scroll_started
 
-            # Check if listing has "Just listed" pill
-            has_just_listed_pill = find_just_listed_pill(listing)
-
-            # Only add the item if the title includes any of the query terms
-            query_parts = query.split(' ')
-            if title is not None and post_url is not None and image is not None and any(part.lower() in title.lower() for part in query_parts):
-                # Append the parsed data to the list.
-                parsed.append({
-                    'image': image,
-                    'title': title,
-                    'post_url': post_url,
-                    'has_just_listed_pill': has_just_listed_pill
-                })
+        # Only keep complete items whose title matches the query, most relevant first
+        parsed = [listing for listing in listings if listing_is_complete(listing)]
+        if RELEVANCE_RANKING_ENABLED:
+            parsed = matcher.rank(parsed)
+        else:
+            parsed = [listing for listing in parsed if matcher.matches(listing['title'])]
 
         # Return the parsed data as a JSON.
         result = []
@@ -546,31 +1798,520 @@ def crawl_query_worker(city: str, query: str, max_price: int, max_results: int,
                 item_type = 'suggested'  # 💡 SUGGESTED items: Suggested results without "Just listed" pill
             else:
                 item_type = 'recent'  # No badge: Recent results without "Just listed" pill
-            
-            result.append({
-                'name': item['title'],
-                'title': item['title'],
-                'image': item['image'],
-                'link': item['post_url'],
-                'has_just_listed_pill': item['has_just_listed_pill'],
-                'item_type': item_type
-            })
+
+            price_amount, currency = parse_price(item.get('price'))
+            result.append(Listing(
+                # The ID is worked out once here and travels with the item from now on
+                item_id=listing_item_id(item),
+                title=item['title'],
+                image=item['image'],
+                link=canonical_listing_url(item['post_url']),
+                price=item.get('price'),
+                price_amount=price_amount,
+                currency=currency,
+                location=item.get('location'),
+                # GraphQL records carry the creation time, cards a relative age ("3 hours ago")
+                listed_at=item.get('listed_at') or listed_at_from_age(item.get('listed_age'), crawl_started_at),
+                has_just_listed_pill=item['has_just_listed_pill'],
+                item_type=item_type,
+            ))
+        new_listings = len(result)
+        if INCREMENTAL_CRAWL_ENABLED and not suggested:
+            # Add the listings still on the page from the previous crawl back below the new ones
+            result = crawl_high_water_marks.update(
+                city, query, max_price, max_results,
+                [listing_item_id(listing) for listing in listings], result, known_ids is not None
+            )
+
+        record_crawl_metrics({
+            'timestamp': datetime.now().timestamp(),
+            'worker_id': worker.worker_id,
+            'query': query,
+            'suggested': suggested,
+            'navigation_seconds': round(navigated - crawl_started, 3),
+            'time_to_ready': round(readiness['time_to_ready'], 3),
+            'ready': readiness['ready'],
+            'anchor_count': readiness['listing_count'],
+            'parse_seconds': round(parse_seconds, 4),
+            'extraction_mode': extraction_mode,
+            'bytes_transferred': bytes_transferred,
+            'blocked_requests': worker.resource_stats['blocked_requests'],
+            'blocked_by_type': worker.resource_stats['blocked_by_type'],
+            'estimated_bytes_saved': worker.resource_stats['estimated_bytes_saved'],
+            'total_seconds': round(time.monotonic() - crawl_started, 3),
+            'results': len(result),
+            'scroll_steps': scroll_steps,
+            'scroll_seconds': round(scroll_seconds, 3),
+            'incremental': known_ids is not None,
+            'new_listings': new_listings,
+        })
+        logger.info(f"Listings ready in {readiness['time_to_ready']:.2f}s ({readiness['listing_count']} anchors, ready={readiness['ready']})")
 
         return result
     except Exception as e:
-        logger.error(f"Error during crawl in worker: {e}")
+        logger.error(f"Error during crawl in worker {worker.worker_id}: {e}")
         # Try to restart browser in worker thread
         try:
-            restart_browser_worker()
+            restart_browser_worker(worker)
         except Exception as restart_error:
-            logger.error(f"Failed to restart browser in worker: {restart_error}")
-        return []  # Return empty results instead of crashing
+            logger.error(f"Failed to restart browser in worker {worker.worker_id}: {restart_error}")
+        # Re-raise so the pool can track the worker's health; crawl_query() still returns []
+        raise
 
 def crawl_query_with_playwright(city: str, query: str, max_price: int, max_results: int, suggested: bool):
     """Alternative approach - now also uses worker thread system"""
     # This function now just calls the main crawl_query which uses the worker
     return crawl_query(city, query, max_price, max_results, suggested)
 
+# HTML parser used for page.content(): "lxml", "selectolax" or "html.parser".
+# Unavailable backends fall back to the next one, ending with the pure-Python "html.parser".
+HTML_PARSER_BACKEND = os.getenv('HTML_PARSER_BACKEND', 'lxml')
+
+def resolve_parser_backend(backend=None):
+    """Return the configured parser backend, falling back to one that is installed"""
+    backend = (backend or HTML_PARSER_BACKEND).lower()
+    if backend == 'selectolax' and LexborHTMLParser is None:
+        logger.warning("selectolax is not installed, falling back to lxml")
+        backend = 'lxml'
+    if backend == 'lxml' and not LXML_AVAILABLE:
+        backend = 'html.parser'
+    if backend not in ('selectolax', 'lxml', 'html.parser'):
+        logger.warning(f"Unknown HTML_PARSER_BACKEND '{backend}', using html.parser")
+        backend = 'html.parser'
+    return backend
+
+def make_soup(html, backend=None):
+    """Build a BeautifulSoup tree with the fastest available tree builder"""
+    builder = 'lxml' if resolve_parser_backend(backend) != 'html.parser' else 'html.parser'
+    try:
+        return BeautifulSoup(html, builder)
+    except FeatureNotFound:
+        return BeautifulSoup(html, 'html.parser')
+
+def parse_listings_html(html, backend=None, stop_at_ids=None):
+    """Parse the page HTML with the configured backend and return (listings, backend used)"""
+    backend = resolve_parser_backend(backend)
+    if backend == 'selectolax':
+        tree = LexborHTMLParser(html)
+        listings = extract_marketplace_listings_selectolax(tree, stop_at_ids)
+        # A page whose first listing is already known is a valid, empty delta
+        if listings or (stop_at_ids and tree.css_first(LISTING_ANCHOR_SELECTOR)):
+            return listings, backend
+        # The find_* strategies and FALLBACK_SELECTORS need a BeautifulSoup tree
+        backend = 'lxml' if LXML_AVAILABLE else 'html.parser'
+
+    soup = make_soup(html, backend)
+    # Walk the item anchors once; fall back to the multi-strategy finders if the layout changed
+    listings = extract_marketplace_listings(soup, stop_at_ids)
+    if not listings and not (stop_at_ids and soup.select_one(LISTING_ANCHOR_SELECTOR)):
+        listings = truncate_at_known_ids(extract_listings_with_strategies(soup), stop_at_ids)
+    return listings, backend
+
+# How listings are pulled out of the page: "dom" runs the extractor inside the page and
+# only ships the compact records back, "html" serializes the whole DOM with page.content(),
+# "graphql" reads the Marketplace search GraphQL responses and falls back to "dom".
+EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'dom').lower()
+
+# In-page version of extract_marketplace_listings(): one TreeWalker pass per item anchor
+IN_PAGE_EXTRACT_LISTINGS_JS = r"""
+({ anchorSelector, justListedTexts, titleSkipWords, stopAtIds, pricePattern, agePattern, locationPattern, freePriceTexts }) => {
+    const listings = [];
+    const seenUrls = new Set();
+    const stopAt = new Set(stopAtIds);
+    const priceRe = new RegExp(pricePattern);
+    const ageRe = new RegExp(agePattern);
+    const locationRe = new RegExp(locationPattern);
+    // Same rule as is_price_text(): a bare number is not a price
+    const isPrice = (text) => {
+        if (freePriceTexts.includes(text.toLowerCase())) {
+            return true;
+        }
+        const match = text.match(priceRe);
+        return match !== null && Boolean(match[1] || match[2] || match[4] || match[5]);
+    };
+    for (const anchor of document.querySelectorAll(anchorSelector)) {
+        // Extracted by an earlier call on this page (scroll-and-harvest)
+        if (anchor.hasAttribute('data-harvested')) {
+            continue;
+        }
+        let href = anchor.getAttribute('href');
+        if (href.startsWith('/')) {
+            href = 'https://www.facebook.com' + href;
+        }
+        if (seenUrls.has(href)) {
+            continue;
+        }
+        const itemId = href.match(/\/marketplace\/item\/(\d+)/);
+        // Results are newest first: everything from a known listing down was seen already
+        if (itemId && stopAt.has(itemId[1])) {
+            break;
+        }
+
+        let image = null;
+        let title = null;
+        let price = null;
+        let location = null;
+        let listedAge = null;
+        let hasJustListedPill = false;
+        const walker = document.createTreeWalker(anchor, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT);
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            if (node.nodeType === Node.TEXT_NODE) {
+                const text = node.textContent.trim();
+                if (!text) {
+                    continue;
+                }
+                const textLower = text.toLowerCase();
+                // Same order as read_card_text()
+                if (justListedTexts.includes(textLower)) {
+                    hasJustListedPill = true;
+                } else if (price === null && isPrice(text)) {
+                    price = text;
+                } else if (listedAge === null && ageRe.test(textLower)) {
+                    listedAge = text;
+                } else if (title === null) {
+                    if (text.length > 5 && text.length < 200
+                        && !titleSkipWords.some(skip => textLower.includes(skip))) {
+                        title = text;
+                    }
+                } else if (location === null && locationRe.test(text)) {
+                    location = text;
+                }
+            } else if (node.tagName === 'IMG' && image === null) {
+                image = node.getAttribute('src');
+            }
+        }
+
+        if (image === null && title === null) {
+            continue;
+        }
+        seenUrls.add(href);
+        anchor.setAttribute('data-harvested', '');
+        listings.push({
+            item_id: itemId ? itemId[1] : null,
+            image: image,
+            title: title,
+            post_url: href,
+            price: price,
+            location: location,
+            listed_age: listedAge,
+            has_just_listed_pill: hasJustListedPill
+        });
+    }
+    return listings;
+}
+"""
+
+def extract_listings_from_page(page, graphql_collector=None, stop_at_ids=None):
+    """Collect the listings with the configured extraction mode; returns (listings, mode, bytes transferred)
+
+    With stop_at_ids, extraction stops at the first listing whose item ID is in the set.
+    """
+    if graphql_collector is not None:
+        listings, payload_bytes = graphql_collector.collect_listings()
+        if listings:
+            return truncate_at_known_ids(listings, stop_at_ids), 'graphql', payload_bytes
+        logger.info("No Marketplace search GraphQL responses captured, falling back to in-page extraction")
+
+    if EXTRACTION_MODE in ('dom', 'graphql'):
+        try:
+            listings = extract_rendered_listings(page, stop_at_ids)
+            if listings or stop_at_ids and page.query_selector(LISTING_ANCHOR_SELECTOR):
+                return listings, 'dom', len(json.dumps(listings).encode('utf-8'))
+            logger.info("In-page extractor found no listings, falling back to HTML parsing")
+        except Exception as e:
+            logger.warning(f"In-page extraction failed, falling back to HTML parsing: {e}")
+
+    html = page.content()
+    listings, backend = parse_listings_html(html, stop_at_ids=stop_at_ids)
+    return listings, f'html:{backend}', len(html.encode('utf-8'))
+
+def extract_rendered_listings(page, stop_at_ids=None):
+    """Run the in-page extractor over the anchors no earlier call on this page has extracted"""
+    return page.evaluate(IN_PAGE_EXTRACT_LISTINGS_JS, {
+        'anchorSelector': LISTING_ANCHOR_SELECTOR,
+        'justListedTexts': JUST_LISTED_TEXTS,
+        'titleSkipWords': TITLE_SKIP_WORDS,
+        'stopAtIds': list(stop_at_ids or []),
+        'pricePattern': PRICE_PATTERN,
+        'agePattern': AGE_PATTERN,
+        'locationPattern': LOCATION_PATTERN,
+        'freePriceTexts': FREE_PRICE_TEXTS,
+    })
+
+# Scroll-and-harvest: when more listings are requested than the first screen holds,
+# scroll the results feed and extract only the newly rendered listings on each step.
+SCROLL_HARVEST_ENABLED = os.getenv('SCROLL_HARVEST_ENABLED', 'true').lower() == 'true'
+# Upper bounds on the number of scrolls and the total seconds spent scrolling per crawl
+SCROLL_MAX_STEPS = int(os.getenv('SCROLL_MAX_STEPS', '10'))
+SCROLL_TIME_BUDGET_SECONDS = float(os.getenv('SCROLL_TIME_BUDGET_SECONDS', '15'))
+# Seconds to wait for more listings to render after each scroll
+SCROLL_STEP_TIMEOUT = float(os.getenv('SCROLL_STEP_TIMEOUT', '3'))
+
+def scroll_and_harvest(page, listings, matcher, max_results):
+    """Scroll the feed, adding newly rendered listings until max_results of them match the query
+
+    Returns (listings, scroll steps). Stops early when a scroll renders nothing new or
+    SCROLL_TIME_BUDGET_SECONDS runs out.
+    """
+    deadline = time.monotonic() + SCROLL_TIME_BUDGET_SECONDS
+    seen_ids = {listing_item_id(listing) for listing in listings}
+    matches = sum(1 for listing in listings if listing_matches_query(listing, matcher))
+    steps = 0
+    while matches < max_results and steps < SCROLL_MAX_STEPS and time.monotonic() < deadline:
+        anchor_count = page.locator(LISTING_ANCHOR_SELECTOR).count()
+        page.evaluate('() => window.scrollTo(0, document.body.scrollHeight)')
+        steps += 1
+        # Wait for the feed to append the next batch of listings
+        step_deadline = min(time.monotonic() + SCROLL_STEP_TIMEOUT, deadline)
+        while page.locator(LISTING_ANCHOR_SELECTOR).count() <= anchor_count and time.monotonic() < step_deadline:
+            page.wait_for_timeout(LISTINGS_READY_POLL_INTERVAL * 1000)
+
+        # Only the anchors rendered since the last step are walked and sent back
+        new_listings = [listing for listing in extract_rendered_listings(page) if listing_item_id(listing) not in seen_ids]
+        if not new_listings:
+            break
+        for listing in new_listings:
+            seen_ids.add(listing_item_id(listing))
+            listings.append(listing)
+            if listing_matches_query(listing, matcher):
+                matches += 1
+    return listings, steps
+
+# GraphQL requests whose responses carry Marketplace search results
+MARKETPLACE_GRAPHQL_URL = '/api/graphql'
+MARKETPLACE_SEARCH_QUERY_NAMES = ['MarketplaceSearch', 'MarketplaceFeed']
+# Listings created within this many seconds count as "Just listed" in GraphQL mode
+GRAPHQL_JUST_LISTED_SECONDS = int(os.getenv('GRAPHQL_JUST_LISTED_SECONDS', '3600'))
+
+class GraphQLResponseCollector:
+    """Collect the Marketplace search GraphQL responses a page receives"""
+
+    def __init__(self):
+        self.page = None
+        self.responses = []
+
+    def attach(self, page):
+        self.page = page
+        page.on("response", self.on_response)
+
+    def detach(self):
+        try:
+            self.page.remove_listener("response", self.on_response)
+        except Exception as e:
+            # The page may have been replaced by a visible browser during login
+            logger.debug(f"Could not detach GraphQL listener: {e}")
+
+    def on_response(self, response):
+        # Only keep the responses here; bodies are read after the page settles
+        if MARKETPLACE_GRAPHQL_URL not in response.url:
+            return
+        post_data = response.request.post_data or ''
+        if any(name in post_data for name in MARKETPLACE_SEARCH_QUERY_NAMES):
+            self.responses.append(response)
+
+    def collect_listings(self):
+        """Parse the captured responses; returns (listings, payload bytes)"""
+        listings = []
+        seen_item_ids = set()
+        payload_bytes = 0
+        for response in self.responses:
+            try:
+                body = response.text()
+            except Exception as e:
+                logger.warning(f"Could not read GraphQL response body: {e}")
+                continue
+            payload_bytes += len(body.encode('utf-8'))
+            for listing in parse_marketplace_graphql_payload(body):
+                if listing['item_id'] not in seen_item_ids:
+                    seen_item_ids.add(listing['item_id'])
+                    listings.append(listing)
+        return listings, payload_bytes
+
+def iter_json_documents(text):
+    """Yield every JSON document in a GraphQL response body, which may hold several back to back"""
+    decoder = json.JSONDecoder()
+    # Facebook prefixes some responses with an anti-hijacking guard
+    if text.startswith('for (;;);'):
+        text = text[len('for (;;);'):]
+    position = 0
+    length = len(text)
+    while position < length:
+        # Skip whitespace between documents
+        while position < length and text[position].isspace():
+            position += 1
+        if position >= length:
+            break
+        try:
+            document, position = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            # Skip to the next line on a truncated or non-JSON chunk
+            next_line = text.find('\n', position)
+            if next_line == -1:
+                break
+            position = next_line + 1
+            continue
+        yield document
+
+def parse_marketplace_graphql_payload(text):
+    """Turn a Marketplace search GraphQL response body into listing records"""
+    now = datetime.now().timestamp()
+    listings = []
+    for document in iter_json_documents(text):
+        # Walk the document without recursion; search results sit at varying depths
+        stack = [document]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(reversed(node))
+                continue
+            if not isinstance(node, dict):
+                continue
+            listing = node.get('listing')
+            if isinstance(listing, dict) and listing.get('id') and 'marketplace_listing_title' in listing:
+                listings.append(graphql_listing_to_record(listing, now))
+                continue
+            stack.extend(reversed(list(node.values())))
+    return listings
+
+def graphql_listing_to_record(listing, now=None):
+    """Map one GraphQL listing node onto the extractor's record fields"""
+    now = datetime.now().timestamp() if now is None else now
+    item_id = str(listing['id'])
+
+    image = None
+    photo = listing.get('primary_listing_photo') or {}
+    if isinstance(photo.get('image'), dict):
+        image = photo['image'].get('uri')
+
+    price = listing.get('listing_price') or {}
+    location = None
+    geocode = (listing.get('location') or {}).get('reverse_geocode') or {}
+    if geocode.get('city'):
+        location = ', '.join(part for part in (geocode.get('city'), geocode.get('state')) if part)
+    created_at = listing.get('creation_time')
+    has_just_listed_pill = bool(created_at) and now - created_at < GRAPHQL_JUST_LISTED_SECONDS
+
+    return {
+        'item_id': item_id,
+        'image': image,
+        'title': listing.get('marketplace_listing_title') or listing.get('custom_title'),
+        'post_url': f'https://www.facebook.com/marketplace/item/{item_id}/',
+        'has_just_listed_pill': has_just_listed_pill,
+        'price': price.get('formatted_amount'),
+        'location': location,
+        'listed_age': None,
+        'listed_at': created_at,
+    }
+
+# Texts Facebook uses for the "Just listed" pill
+JUST_LISTED_TEXTS = ['just listed', 'just now', 'new listing', 'recently listed']
+# Text that marks a span as price/UI chrome rather than the listing title
+TITLE_SKIP_WORDS = ['$', 'price', 'location', 'see more', 'show more']
+
+def new_card():
+    """Empty fields of one listing card, filled by read_card_text()"""
+    return {'title': None, 'price': None, 'location': None, 'listed_age': None, 'has_just_listed_pill': False}
+
+def read_card_text(card, text):
+    """Sort one text of a listing card into its fields; IN_PAGE_EXTRACT_LISTINGS_JS mirrors this"""
+    text_lower = text.lower()
+    if text_lower in JUST_LISTED_TEXTS:
+        card['has_just_listed_pill'] = True
+    elif card['price'] is None and is_price_text(text):
+        card['price'] = text
+    elif card['listed_age'] is None and AGE_RE.match(text_lower):
+        card['listed_age'] = text
+    elif card['title'] is None:
+        if len(text) > 5 and len(text) < 200:  # Reasonable title length
+            # Skip common UI elements
+            if not any(skip in text_lower for skip in TITLE_SKIP_WORDS):
+                card['title'] = text
+    # The location follows the title on the card
+    elif card['location'] is None and LOCATION_RE.match(text):
+        card['location'] = text
+
+def extract_marketplace_listings(soup, stop_at_ids=None):
+    """Extract image, title, url, price, location, age and "Just listed" flag of every listing in a single pass."""
+    # Each listing card is wrapped in its item anchor, so walking every anchor's
+    # subtree once visits each node of the results grid a single time.
+    listings = []
+    seen_urls = set()
+    for anchor in soup.select(LISTING_ANCHOR_SELECTOR):
+        href = anchor.get('href')
+        # Convert relative URLs to absolute
+        if href.startswith('/'):
+            href = 'https://www.facebook.com' + href
+        if href in seen_urls:
+            continue
+        # Results are newest first: everything from a known listing down was seen already
+        if stop_at_ids and extract_item_id(href) in stop_at_ids:
+            break
+
+        image = None
+        card = new_card()
+        for node in anchor.descendants:
+            if isinstance(node, NavigableString):
+                text = node.strip()
+                if text:
+                    read_card_text(card, text)
+            elif node.name == 'img' and image is None:
+                image = node.get('src')
+
+        if image is None and card['title'] is None:
+            continue
+        seen_urls.add(href)
+        listings.append({'image': image, 'post_url': href, **card})
+
+    return listings
+
+def extract_marketplace_listings_selectolax(tree, stop_at_ids=None):
+    """selectolax version of extract_marketplace_listings() producing the same records."""
+    listings = []
+    seen_urls = set()
+    for anchor in tree.css(LISTING_ANCHOR_SELECTOR):
+        href = anchor.attributes.get('href')
+        # Convert relative URLs to absolute
+        if href.startswith('/'):
+            href = 'https://www.facebook.com' + href
+        if href in seen_urls:
+            continue
+        # Results are newest first: everything from a known listing down was seen already
+        if stop_at_ids and extract_item_id(href) in stop_at_ids:
+            break
+
+        image = None
+        card = new_card()
+        for node in anchor.traverse(include_text=True):
+            if node.tag == '-text':
+                text = node.text(deep=False).strip()
+                if text:
+                    read_card_text(card, text)
+            elif node.tag == 'img' and image is None:
+                image = node.attributes.get('src')
+
+        if image is None and card['title'] is None:
+            continue
+        seen_urls.add(href)
+        listings.append({'image': image, 'post_url': href, **card})
+
+    return listings
+
+def extract_listings_with_strategies(soup):
+    """Extract listings with the multi-strategy finders, used when the anchor pass finds nothing."""
+    listings = []
+    for listing in find_marketplace_listings(soup):
+        listings.append({
+            # Get the item image using multiple strategies
+            'image': find_listing_image(listing),
+            # Get the item title using multiple strategies
+            'title': find_listing_title(listing),
+            # Get the item URL using multiple strategies
+            'post_url': find_listing_url(listing),
+            # Check if listing has "Just listed" pill
+            'has_just_listed_pill': find_just_listed_pill(listing)
+        })
+    return listings
+
 def find_marketplace_listings(soup):
     """Find marketplace listings using multiple strategies."""
     # Strategy 1: Look for divs that contain both an image and a link (common marketplace pattern)
@@ -640,7 +2381,7 @@ def find_listing_title(listing):
         text = span.get_text(strip=True)
         if text and len(text) > 5 and len(text) < 200:  # Reasonable title length
             # Skip common UI elements
-            if not any(skip in text.lower() for skip in ['$', 'price', 'location', 'see more', 'show more']):
+            if not any(skip in text.lower() for skip in TITLE_SKIP_WORDS):
                 return text
     
     # Strategy 2: Look for any text in links
@@ -707,7 +2448,7 @@ def find_just_listed_pill(listing):
     all_text_elements = listing.find_all(text=True)
     for text in all_text_elements:
         text_lower = text.strip().lower()
-        if text_lower in ['just listed', 'just now', 'new listing', 'recently listed']:
+        if text_lower in JUST_LISTED_TEXTS:
             return True
     
     # Strategy 2: Look for specific elements that might contain the pill
@@ -715,14 +2456,14 @@ def find_just_listed_pill(listing):
     spans = listing.find_all('span')
     for span in spans:
         span_text = span.get_text(strip=True).lower()
-        if span_text in ['just listed', 'just now', 'new listing', 'recently listed']:
+        if span_text in JUST_LISTED_TEXTS:
             return True
     
     # Strategy 3: Look for divs with pill-like styling or content
     divs = listing.find_all('div')
     for div in divs:
         div_text = div.get_text(strip=True).lower()
-        if div_text in ['just listed', 'just now', 'new listing', 'recently listed']:
+        if div_text in JUST_LISTED_TEXTS:
             # Check if this div looks like a pill (small, styled element)
             if len(div_text) < 20 and not div.find_all(['img', 'a']):  # Likely a text pill
                 return True
@@ -737,31 +2478,6 @@ def find_just_listed_pill(listing):
     
     return False
 
-def extract_item_id(url):
-    """Extract the item ID from a Facebook Marketplace URL"""
-    if not url:
-        return None
-    
-    # Handle relative URLs by converting to absolute first
-    if url.startswith('/'):
-        url = f"https://www.facebook.com{url}"
-    
-    # Look for patterns like /marketplace/item/{item_id} or /marketplace/item/{item_id}/?...
-    import re
-    patterns = [
-        r'/marketplace/item/(\d+)',  # Most common pattern
-        r'marketplace.*?item.*?(\d+)',  # Backup pattern
-        r'item.*?(\d+)',  # Even more generic
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    
-    # If no pattern matches, use the full URL as fallback (shouldn't happen but safe)
-    return url
-
 # Configuration for fallback selectors (can be updated if needed)
 FALLBACK_SELECTORS = {
     'listings': [
@@ -791,40 +2507,84 @@ FALLBACK_SELECTORS = {
 EMAIL_SENDER = os.getenv('GMAIL_SENDER', '')  # Your Gmail address
 EMAIL_PASSWORD = os.getenv('GMAIL_APP_PASSWORD', '')  # Your Gmail App Password
 EMAIL_RECIPIENTS = os.getenv('EMAIL_RECIPIENTS', '').split(',')  # Comma-separated recipient emails
+# SMTP server; point these at a local debugging server (e.g. python -m aiosmtpd -n -l localhost:1025)
+# with SMTP_STARTTLS=false and SMTP_AUTH=false to test notifications without Gmail
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+SMTP_AUTH = os.getenv('SMTP_AUTH', 'true').lower() == 'true'
+SMTP_TIMEOUT = 30
 
-def send_hot_item_email(hot_items, query, city):
-    """Send email notification for HOT items found"""
-    logger.info(f"Preparing to send email for {len(hot_items)} HOT items found in {city} for query '{query}'")
-    if not EMAIL_SENDER or not EMAIL_PASSWORD or not EMAIL_RECIPIENTS[0]:
-        logger.warning("Email configuration not set. Skipping email notification.")
-        return False
-    
+def email_configured():
+    """Whether enough email settings are present to send notifications"""
+    return bool(EMAIL_SENDER and EMAIL_RECIPIENTS[0] and (EMAIL_PASSWORD or not SMTP_AUTH))
+
+def open_smtp_connection():
+    """Connect, upgrade to TLS and log in to the configured SMTP server"""
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"🔥 {len(hot_items)} HOT Marketplace Item{'s' if len(hot_items) > 1 else ''} Found!"
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = ', '.join(EMAIL_RECIPIENTS)
-        
-        # Create HTML content
-        html_content = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto;">
-            <div style="background: linear-gradient(135deg, #ff4444, #ff6666); color: white; padding: 20px; text-align: center; border-radius: 8px; margin-bottom: 20px;">
-                <h1 style="margin: 0; font-size: 28px;">🔥 HOT ITEMS ALERT! 🔥</h1>
-                <p style="margin: 10px 0 0 0; font-size: 16px;">Found {len(hot_items)} hot item{'s' if len(hot_items) > 1 else ''} in {city} for "{query}"</p>
-                <p style="margin: 5px 0 0 0; font-size: 14px; opacity: 0.9;">{datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
-            </div>
-        """
-        
+        if SMTP_STARTTLS:
+            server.starttls(context=ssl.create_default_context())
+        if SMTP_AUTH:
+            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+def format_listing_url(listing_url):
+    # Fix URL formatting
+    if listing_url.startswith('/'):
+        return f"https://www.facebook.com{listing_url}"
+    elif not listing_url.startswith('http'):
+        return f"https://www.facebook.com/{listing_url}"
+    return listing_url
+
+def build_hot_item_email(searches):
+    """Build the HOT items email for a list of (hot_items, query, city), one section per search"""
+    total = sum(len(hot_items) for hot_items, query, city in searches)
+    if len(searches) == 1:
+        hot_items, query, city = searches[0]
+        summary = f"""Found {total} hot item{'s' if total > 1 else ''} in {city} for "{query}\""""
+    else:
+        summary = f"Found {total} hot item{'s' if total > 1 else ''} across {len(searches)} searches"
+    sent_at = datetime.now().strftime('%B %d, %Y at %I:%M %p')
+
+    # Create message
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"🔥 {total} HOT Marketplace Item{'s' if total > 1 else ''} Found!"
+    msg['From'] = EMAIL_SENDER
+    msg['To'] = ', '.join(EMAIL_RECIPIENTS)
+
+    # Create HTML content
+    html_content = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto;">
+        <div style="background: linear-gradient(135deg, #ff4444, #ff6666); color: white; padding: 20px; text-align: center; border-radius: 8px; margin-bottom: 20px;">
+            <h1 style="margin: 0; font-size: 28px;">🔥 HOT ITEMS ALERT! 🔥</h1>
+            <p style="margin: 10px 0 0 0; font-size: 16px;">{summary}</p>
+            <p style="margin: 5px 0 0 0; font-size: 14px; opacity: 0.9;">{sent_at}</p>
+        </div>
+    """
+    # Create plain text version
+    text_content = f"""
+HOT ITEMS ALERT!
+
+{summary}
+{sent_at}
+
+"""
+
+    for hot_items, query, city in searches:
+        if len(searches) > 1:
+            html_content += f"""
+            <h2 style="color: #ff4444; margin: 25px 0 5px 0;">{query} in {city}</h2>
+            """
+            text_content += f"""
+== {query} in {city} ==
+"""
         for item in hot_items:
-            # Fix URL formatting
-            listing_url = item['link']
-            if listing_url.startswith('/'):
-                listing_url = f"https://www.facebook.com{listing_url}"
-            elif not listing_url.startswith('http'):
-                listing_url = f"https://www.facebook.com/{listing_url}"
-            
+            listing_url = format_listing_url(item['link'])
             html_content += f"""
             <div style="border: 3px solid #ff4444; border-radius: 12px; padding: 20px; margin: 15px 0; background: #fff9f9;">
                 <div style="display: inline-block; background: #ff4444; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px; font-weight: bold; margin-bottom: 10px;">🔥 HOT ITEM</div>
@@ -839,56 +2599,43 @@ def send_hot_item_email(hot_items, query, city):
                 </div>
             </div>
             """
-        
-        html_content += """
-        <div style="text-align: center; padding: 20px; background: #f8f8f8; border-radius: 8px; margin-top: 20px; color: #666;">
-            <p style="margin: 0; font-size: 14px;">This alert was sent by DingBot™ Facebook Scraper</p>
-            <p style="margin: 5px 0 0 0; font-size: 12px;">Hot items are suggested results with Facebook's "Just listed" indicator</p>
-        </div>
-        </body>
-        </html>
-        """
-        
-        # Create plain text version
-        text_content = f"""
-HOT ITEMS ALERT!
-
-Found {len(hot_items)} hot item{'s' if len(hot_items) > 1 else ''} in {city} for "{query}"
-{datetime.now().strftime('%B %d, %Y at %I:%M %p')}
-
-"""
-        
-        for item in hot_items:
-            listing_url = item['link']
-            if listing_url.startswith('/'):
-                listing_url = f"https://www.facebook.com{listing_url}"
-            elif not listing_url.startswith('http'):
-                listing_url = f"https://www.facebook.com/{listing_url}"
-            
             text_content += f"""
 🔥 HOT ITEM: {item['title']}
 Link: {listing_url}
 Image: {item['image']}
 
 """
-        
-        text_content += """
+
+    html_content += """
+    <div style="text-align: center; padding: 20px; background: #f8f8f8; border-radius: 8px; margin-top: 20px; color: #666;">
+        <p style="margin: 0; font-size: 14px;">This alert was sent by DingBot™ Facebook Scraper</p>
+        <p style="margin: 5px 0 0 0; font-size: 12px;">Hot items are suggested results with Facebook's "Just listed" indicator</p>
+    </div>
+    </body>
+    </html>
+    """
+    text_content += """
 ---
 This alert was sent by DingBot™ Facebook Scraper
 Hot items are suggested results with Facebook's "Just listed" indicator
 """
-        
-        # Attach text and HTML versions
-        text_part = MIMEText(text_content, 'plain')
-        html_part = MIMEText(html_content, 'html')
-        msg.attach(text_part)
-        msg.attach(html_part)
-        
+
+    # Attach text and HTML versions
+    msg.attach(MIMEText(text_content, 'plain'))
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+def send_hot_item_email(hot_items, query, city):
+    """Send email notification for HOT items found (synchronously, on a new connection)"""
+    logger.info(f"Preparing to send email for {len(hot_items)} HOT items found in {city} for query '{query}'")
+    if not email_configured():
+        logger.warning("Email configuration not set. Skipping email notification.")
+        return False
+    
+    try:
+        msg = build_hot_item_email([(hot_items, query, city)])
         # Send email
-        context = ssl.create_default_context()
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls(context=context)
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+        with open_smtp_connection() as server:
             server.send_message(msg)
         
         logger.info(f"Successfully sent email notification for {len(hot_items)} hot items")
@@ -898,62 +2645,161 @@ Hot items are suggested results with Facebook's "Just listed" indicator
         logger.error(f"Failed to send email notification: {e}")
         return False
 
+# Background email notifications: hot items are queued by the crawls and sent by one thread
+# over a reused SMTP connection, so sending never holds up an API response.
+# Seconds to collect hot items after the first one arrives, so one poll cycle sends one digest
+NOTIFICATION_DIGEST_WINDOW = float(os.getenv('NOTIFICATION_DIGEST_WINDOW', '10'))
+# Send attempts per digest, and the first/maximum seconds between them (doubling)
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '5'))
+NOTIFICATION_RETRY_BASE_SECONDS = 2.0
+NOTIFICATION_RETRY_MAX_SECONDS = 60.0
+# Close the SMTP connection after this many idle seconds, before the server drops it
+SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', '120'))
+
+class NotificationDispatcher:
+    """Sends queued hot items as digest emails over a persistent, reconnecting SMTP connection"""
+
+    def __init__(self, digest_window=NOTIFICATION_DIGEST_WINDOW):
+        self.digest_window = digest_window
+        # (hot_items, query, city) waiting to be sent
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._smtp = None
+        self._smtp_used_at = 0.0
+        self.stats = {'queued': 0, 'digests_sent': 0, 'items_sent': 0, 'send_failures': 0, 'connections_opened': 0}
+
+    def enqueue(self, hot_items, query, city):
+        """Queue a search's new hot items for the next digest; returns immediately"""
+        self._queue.put((hot_items, query, city))
+        self.stats['queued'] += len(hot_items)
+
+    def _collect_digest(self):
+        """Wait for queued hot items, then gather everything that arrives within the digest window"""
+        try:
+            searches = [self._queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.digest_window
+        while not self._stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                searches.append(self._queue.get(timeout=min(remaining, 1)))
+            except queue.Empty:
+                continue
+        # Several searches of the same cycle go into one section each
+        return merge_digest_searches(searches)
+
+    def _connection(self):
+        if self._smtp is not None:
+            try:
+                # Reuse the open connection if the server still answers
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException as e:
+                logger.info(f"SMTP connection lost, reconnecting: {e}")
+            except OSError as e:
+                logger.info(f"SMTP connection lost, reconnecting: {e}")
+            self._close_connection()
+        self._smtp = open_smtp_connection()
+        self.stats['connections_opened'] += 1
+        return self._smtp
+
+    def _close_connection(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
+    def _send_digest(self, searches):
+        msg = build_hot_item_email(searches)
+        item_count = sum(len(hot_items) for hot_items, query, city in searches)
+        delay = NOTIFICATION_RETRY_BASE_SECONDS
+        for attempt in range(1, NOTIFICATION_MAX_ATTEMPTS + 1):
+            try:
+                self._connection().send_message(msg)
+                self._smtp_used_at = time.monotonic()
+                self.stats['digests_sent'] += 1
+                self.stats['items_sent'] += item_count
+                logger.info(f"Sent digest email with {item_count} hot items from {len(searches)} searches")
+                return True
+            except Exception as e:
+                logger.warning(f"Digest email attempt {attempt}/{NOTIFICATION_MAX_ATTEMPTS} failed: {e}")
+                self._close_connection()
+                if attempt == NOTIFICATION_MAX_ATTEMPTS or self._stop_event.wait(delay):
+                    break
+                delay = min(delay * 2, NOTIFICATION_RETRY_MAX_SECONDS)
+        self.stats['send_failures'] += 1
+        logger.error(f"Giving up on digest email with {item_count} hot items")
+        return False
+
+    def _run(self):
+        while not self._stop_event.is_set() or not self._queue.empty():
+            searches = self._collect_digest()
+            if searches:
+                if email_configured():
+                    self._send_digest(searches)
+                else:
+                    logger.warning("Email configuration not set. Skipping email notification.")
+            elif self._smtp is not None and time.monotonic() - self._smtp_used_at > SMTP_IDLE_TIMEOUT:
+                self._close_connection()
+        self._close_connection()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Send what is still queued without waiting for the digest window, then disconnect"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=SMTP_TIMEOUT + 5)
+
+def merge_digest_searches(searches):
+    """Combine queued (hot_items, query, city) of the same search and drop repeated items"""
+    merged = OrderedDict()
+    seen_links = set()
+    for hot_items, query, city in searches:
+        items = merged.setdefault((query, city), [])
+        for item in hot_items:
+            if item['link'] not in seen_links:
+                seen_links.add(item['link'])
+                items.append(item)
+    return [(items, query, city) for (query, city), items in merged.items() if items]
+
 # Notification tracking system
-NOTIFICATION_TRACKING_FILE = "hot_items_notifications.json"
+# Notified items and seen listings live in a SQLite database shared with the GUI.
+listing_store = ListingStore()
+# Carry over the history from the old JSON tracking file on first start
+listing_store.import_json_file_once(NOTIFICATION_TRACKING_FILE)
+# Requests check notifications in memory; changes reach the database in batches
+notified_items_cache = NotifiedItemsCache(listing_store)
+notified_items_cache.start()
+notification_dispatcher = NotificationDispatcher()
+notification_dispatcher.start()
+# Saved searches are crawled by the scheduler once the API has started
+search_scheduler = SearchScheduler(listing_store)
 
 def load_notified_items():
     """Load the set of item IDs we've already sent notifications for"""
-    try:
-        if Path(NOTIFICATION_TRACKING_FILE).exists():
-            with open(NOTIFICATION_TRACKING_FILE, 'r') as f:
-                data = json.load(f)
-                # Return set of item IDs, and clean old entries (older than 7 days)
-                current_time = datetime.now().timestamp()
-                week_ago = current_time - (7 * 24 * 60 * 60)  # 7 days in seconds
-                
-                # Filter out old entries
-                fresh_items = {
-                    item_id: timestamp 
-                    for item_id, timestamp in data.items() 
-                    if timestamp > week_ago
-                }
-                
-                # Save cleaned data back
-                if len(fresh_items) != len(data):
-                    save_notified_items(fresh_items)
-                
-                return set(fresh_items.keys())
-    except Exception as e:
-        logger.warning(f"Error loading notification tracking file: {e}")
-    
-    return set()
-
-def save_notified_items(notified_items_dict):
-    """Save the dictionary of notified item IDs with timestamps"""
-    try:
-        with open(NOTIFICATION_TRACKING_FILE, 'w') as f:
-            json.dump(notified_items_dict, f, indent=2)
-    except Exception as e:
-        logger.error(f"Error saving notification tracking file: {e}")
+    # Entries older than 7 days are evicted from the cache as they expire
+    return notified_items_cache.item_ids()
 
 def add_notified_items(new_item_ids):
     """Add new item IDs to the notification tracking with current timestamp"""
+    notified_items_cache.add(new_item_ids)
+    logger.info(f"Added {len(new_item_ids)} items to notification tracking")
+
+def record_seen_listings(listings, city, query):
+    """Remember every listing returned for a query with its first/last seen time"""
     try:
-        # Load existing data as dict (item_id -> timestamp)
-        notified_dict = {}
-        if Path(NOTIFICATION_TRACKING_FILE).exists():
-            with open(NOTIFICATION_TRACKING_FILE, 'r') as f:
-                notified_dict = json.load(f)
-        
-        # Add new items with current timestamp
-        current_time = datetime.now().timestamp()
-        for item_id in new_item_ids:
-            notified_dict[item_id] = current_time
-        
-        # Save updated data
-        save_notified_items(notified_dict)
-        logger.info(f"Added {len(new_item_ids)} items to notification tracking")
-        
+        listing_store.record_seen_listings([item.to_dict() for item in listings], city, query)
     except Exception as e:
-        logger.error(f"Error adding items to notification tracking: {e}")
-
+        logger.error(f"Error recording seen listings: {e}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the crawl endpoint: how many concurrent requests can wait on crawls
+Compares the async endpoint with the blocking pattern it replaced, where every request
+held a server thread on result_queue.get() until its crawls finished
+Run with: python benchmark_concurrency.py [concurrent requests] [crawl seconds]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+import httpx
+import uvicorn
+
+# Keep the benchmark's listings out of the real database
+os.environ.setdefault('LISTING_STORE_PATH', os.path.join(tempfile.mkdtemp(), 'benchmark.db'))
+
+# Add the parent directory to Python path to import from app.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as api
+
+PORT = 8765
+
+
+def simulated_crawl_job(crawl_seconds):
+    """Replace the browser pool with crawls that take crawl_seconds and find nothing"""
+    def submit_crawl_job(city, query, max_price, max_results, suggested):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        threading.Timer(crawl_seconds, future.set_result, args=([],)).start()
+        return future
+    return submit_crawl_job
+
+
+# The pre-async endpoint: a sync route that blocks a threadpool thread per request
+@api.app.get("/benchmark/blocking_crawl")
+def blocking_crawl(city: str, query: str, max_price: int, max_results_per_query: int):
+    city = api.resolve_city(city)
+    futures = [api.submit_crawl_job(city, query, max_price, max_results_per_query, suggested) for suggested in (False, True)]
+    return [item for future in futures for item in api.wait_for_crawl_result(future)]
+
+
+async def load(path, requests):
+    """Send `requests` concurrent requests; returns (seconds, succeeded)"""
+    # httpx allows 100 connections by default, which would cap the async endpoint too
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{PORT}', timeout=600, limits=limits) as client:
+        started = time.monotonic()
+        responses = await asyncio.gather(*(
+            # Distinct queries, so the result cache cannot answer or coalesce them
+            client.get(path, params={'city': 'Toronto', 'query': f'vhs {index}', 'max_price': 100, 'max_results_per_query': 8})
+            for index in range(requests)
+        ), return_exceptions=True)
+        seconds = time.monotonic() - started
+    succeeded = sum(1 for response in responses if isinstance(response, httpx.Response) and response.status_code == 200)
+    return seconds, succeeded
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    crawl_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    api.submit_crawl_job = simulated_crawl_job(crawl_seconds)
+
+    server = uvicorn.Server(uvicorn.Config(api.app, host='127.0.0.1', port=PORT, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    print(f"{requests} concurrent requests, every crawl takes {crawl_seconds:.1f}s\n")
+    for name, path in [('blocking (before)', '/benchmark/blocking_crawl'), ('async (after)', '/crawl_facebook_marketplace')]:
+        seconds, succeeded = asyncio.run(load(path, requests))
+        # With unlimited capacity every request finishes after about one crawl
+        waves = seconds / crawl_seconds
+        print(f"{name:>18}: {seconds:6.2f}s for {succeeded}/{requests} requests, "
+              f"{succeeded / seconds:6.1f} requests/s, about {requests / max(waves, 1):.0f} requests waiting at once")
+
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
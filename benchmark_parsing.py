@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark for listing extraction from saved Marketplace search HTML
+Compares the old multi-strategy extractor with the single-pass anchor extractor
+Run with: python benchmark_parsing.py [listings]
+"""
+
+import os
+import re
+import sys
+import timeit
+from pathlib import Path
+
+# Add the parent directory to Python path to import from app.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import (
+    extract_listings_with_strategies, extract_marketplace_listings,
+    extract_marketplace_listings_selectolax, LexborHTMLParser, make_soup, resolve_parser_backend,
+)
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'marketplace_search.html'
+CARD_START = '<div class="x9f619 x78zum5 x1r8uery'
+
+
+def scrolled_page(listings):
+    """The fixture page with its listing cards repeated, like a results page scrolled a long way"""
+    html = FIXTURE.read_text(encoding='utf-8')
+    head, *cards = html.split(CARD_START)
+    # The last card holds the rest of the page after the grid
+    last_card, grid_end = cards[-1].split('\n</div>\n<div class="x1n2onr6">', 1)
+    cards[-1] = last_card
+    body = []
+    for index in range(listings):
+        card = cards[index % len(cards)]
+        # Give every copy its own item ID
+        body.append(CARD_START + re.sub(r'/marketplace/item/\d+', f'/marketplace/item/{10**15 + index}', card))
+    return head + ''.join(body) + '\n</div>\n<div class="x1n2onr6">' + grid_end
+
+
+def run(name, function, number=5):
+    seconds = timeit.timeit(function, number=number) / number
+    listings = len(function())
+    print(f"{name:>40}: {seconds * 1000:8.1f} ms ({listings} listings)")
+    return seconds
+
+
+def main():
+    listings = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    html = scrolled_page(listings)
+    print(f"Page with {listings} listing cards, {len(html.encode('utf-8')) // 1024} KB\n")
+
+    soup = make_soup(html, 'html.parser')
+    # Tree building is timed separately; both extractors walk the same tree
+    old = run('multi-strategy extractor (html.parser)', lambda: extract_listings_with_strategies(soup), number=1)
+    new = run('single-pass extractor (html.parser)', lambda: extract_marketplace_listings(soup))
+    print(f"{'speedup':>40}: {old / new:8.1f}x\n")
+
+    for backend in ['html.parser', 'lxml', 'selectolax']:
+        if resolve_parser_backend(backend) != backend:
+            print(f"{backend:>40}: not installed")
+            continue
+        if backend == 'selectolax':
+            run('parse + extract (selectolax)', lambda: extract_marketplace_listings_selectolax(LexborHTMLParser(html)))
+        else:
+            run(f'parse + extract ({backend})', lambda: extract_marketplace_listings(make_soup(html, backend)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import random
 import streamlit as st
-import schedule
 import streamlit.components.v1 as stcomponents
 import time
 import json 
@@ -8,120 +7,58 @@ import requests
 from datetime import datetime
 from PIL import Image
 from pathlib import Path
-from pathlib import Path
+from listing_store import ListingStore
+from listing_identity import extract_item_id
 
 # Configure page to use full width - must be first Streamlit command
 st.set_page_config(page_title="DingBot™ Facebook Scraper", layout="wide")
 
-# Notification tracking (same as backend)
-NOTIFICATION_TRACKING_FILE = "hot_items_notifications.json"
+# Notification tracking (shared SQLite store with the backend)
+listing_store = ListingStore()
 
 def load_notified_items():
     """Load the set of item IDs we've already sent notifications for"""
     try:
-        if Path(NOTIFICATION_TRACKING_FILE).exists():
-            with open(NOTIFICATION_TRACKING_FILE, 'r') as f:
-                data = json.load(f)
-                # Return set of item IDs, and clean old entries (older than 7 days)
-                current_time = datetime.now().timestamp()
-                week_ago = current_time - (7 * 24 * 60 * 60)  # 7 days in seconds
-                
-                # Filter out old entries
-                fresh_items = {
-                    item_id: timestamp 
-                    for item_id, timestamp in data.items() 
-                    if timestamp > week_ago
-                }
-                
-                return set(fresh_items.keys())
+        return listing_store.load_notified_item_ids()
     except Exception as e:
-        print(f"Error loading notification tracking file: {e}")
+        print(f"Error loading notification tracking: {e}")
     
     return set()
 
 def add_notified_items_gui(new_item_ids):
     """Add new item IDs to the notification tracking with current timestamp (GUI version)"""
     try:
-        # Load existing data as dict (item_id -> timestamp)
-        notified_dict = {}
-        if Path(NOTIFICATION_TRACKING_FILE).exists():
-            with open(NOTIFICATION_TRACKING_FILE, 'r') as f:
-                notified_dict = json.load(f)
-        
-        # Add new items with current timestamp
-        current_time = datetime.now().timestamp()
-        for item_id in new_item_ids:
-            notified_dict[item_id] = current_time
-        
-        # Save updated data
-        with open(NOTIFICATION_TRACKING_FILE, 'w') as f:
-            json.dump(notified_dict, f, indent=2)
-        
+        listing_store.add_notified_items(new_item_ids)
         print(f"GUI: Added {len(new_item_ids)} items to notification tracking")
         
     except Exception as e:
         print(f"GUI: Error adding items to notification tracking: {e}")
 
-def extract_item_id(url):
-    """Extract the item ID from a Facebook Marketplace URL (same as backend)"""
-    if not url:
-        return None
-    
-    # Handle relative URLs by converting to absolute first
-    if url.startswith('/'):
-        url = f"https://www.facebook.com{url}"
-    
-    # Look for patterns like /marketplace/item/{item_id} or /marketplace/item/{item_id}/?...
-    import re
-    patterns = [
-        r'/marketplace/item/(\d+)',  # Most common pattern
-        r'marketplace.*?item.*?(\d+)',  # Backup pattern
-        r'item.*?(\d+)',  # Even more generic
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    
-    # If no pattern matches, use the full URL as fallback (shouldn't happen but safe)
-    return url
-
-def countdown_timer():
-  countdown_message.empty()
-  duration = 3 * 60  # 3 minutes instead of 5
-  while duration:
-        mins, secs = divmod(duration, 60)
-        timeformat = '{:02d}:{:02d}'.format(mins, secs)
-        countdown_message.text(f"Time until next auto scrape: {timeformat}")
-        time.sleep(1)
-        duration -= 1
-  countdown_message.text("Scraping...")
+# The API scrapes saved searches on this interval; the GUI only displays the stored results
+API_URL = "http://127.0.0.1:8000"
+AUTO_SCRAPE_INTERVAL_SECONDS = 3 * 60
+# Saved searches are shared by every open tab; each tab holds a lease on its searches
+# and renews it while it runs, so closed tabs stop costing crawls once the lease ends
+SAVED_SEARCH_LEASE_SECONDS = 5 * 60
+SAVED_SEARCH_RENEW_SECONDS = 60
 
+@st.cache_resource
+def get_http_session():
+  """One pooled HTTP session for every API call, kept across Streamlit reruns"""
+  return requests.Session()
 
 def ding():
   unique_id = f'dingSound_{time.time()}_{random.randint(1, 1000)}'
   audio_html = f'<audio id="{unique_id}" autoplay><source src="app/static/ding.mp3"></audio>'
   stcomponents.html(audio_html)
 
-def crawl():  # Get current values from Streamlit widgets instead of global variables
+def get_search_inputs():  # Get current values from Streamlit widgets instead of global variables
+  """Return (city, query list, max price sent to the API, max listings) from the widgets"""
   current_city = st.session_state.get('city', city)
   current_query = st.session_state.get('query', query)
   current_max_price = st.session_state.get('max_price', max_price)
   current_max_listings = st.session_state.get('max_listings', max_listings)
 
-  # Workaround to hide the ugly iframe that the new results alert component gets rendered in
-  st.markdown(
-    """
-    <style>
-        iframe {
-            display: none;  /* Hide the iframe */
-        }
-    </style>
-    """,
-    unsafe_allow_html=True
-  )
-  
   if "," in current_max_price:
       current_max_price = current_max_price.replace(",", "")
   elif "$" in current_max_price:
@@ -131,18 +68,62 @@ def crawl():  # Get current values from Streamlit widgets instead of global vari
 
   # Split the query to get individual search terms
   query_list = [q.strip() for q in current_query.split(',')]
+  return current_city, query_list, str(int(current_max_price) * 100), current_max_listings
+
+def crawl():
+  current_city, query_list, current_max_price, current_max_listings = get_search_inputs()
   
   # Store results per query for column display
-  results_by_query = {}
+  results_by_query = {individual_query: [] for individual_query in query_list}
   
-  # Get results for each query individually
-  for individual_query in query_list:
-    try:
-      res = requests.get(f"http://127.0.0.1:8000/crawl_facebook_marketplace?city={current_city}&sortBy=creation_time_descend&query={individual_query}&max_price={str(int(current_max_price) * 100)}&max_results_per_query={current_max_listings}")
-      query_results = res.json()
-      results_by_query[individual_query] = query_results
-    except:
-      results_by_query[individual_query] = []
+  # Crawl every query in one batch request so the API schedules them together
+  try:
+    res = get_http_session().post(f"{API_URL}/crawl_facebook_marketplace/batch", json={
+      'searches': [
+        {'city': current_city, 'query': individual_query, 'max_price': int(current_max_price), 'limit': int(current_max_listings)}
+        for individual_query in query_list
+      ],
+    })
+    res.raise_for_status()
+    for search in res.json()['searches']:
+      if search['error']:
+        print(f"GUI: Error crawling '{search['query']}': {search['error']}")
+      results_by_query[search['query']] = search['results']
+  except Exception as e:
+    print(f"GUI: Error crawling searches: {e}")
+
+  show_results(query_list, results_by_query, current_max_listings, datetime.now())
+
+def watch_saved_searches():
+  """Register (or renew the lease on) the current searches with the API scheduler; returns {query: search_id}"""
+  current_city, query_list, current_max_price, current_max_listings = get_search_inputs()
+  try:
+    res = get_http_session().post(f"{API_URL}/saved_searches", json={
+      'city': current_city,
+      'query': ','.join(query_list),
+      'max_price': int(current_max_price),
+      'max_results': int(current_max_listings),
+      'interval_seconds': AUTO_SCRAPE_INTERVAL_SECONDS,
+      'lease_seconds': SAVED_SEARCH_LEASE_SECONDS,
+    })
+    res.raise_for_status()
+    return {search['query']: search['search_id'] for search in res.json()}
+  except Exception as e:
+    print(f"GUI: Error registering saved searches: {e}")
+    return {}
+
+def show_results(query_list, results_by_query, current_max_listings, last_ran):
+  # Workaround to hide the ugly iframe that the new results alert component gets rendered in
+  st.markdown(
+    """
+    <style>
+        iframe {
+            display: none;  /* Hide the iframe */
+        }
+    </style>
+    """,
+    unsafe_allow_html=True
+  )
 
   # Flatten all results for alert checking
   all_results = []
@@ -161,7 +142,7 @@ def crawl():  # Get current values from Streamlit widgets instead of global vari
     new_hot_items_data = []
     
     for link, item in hot_items.items():
-        item_id = extract_item_id(link)
+        item_id = item.get('item_id') or extract_item_id(link)
         if item_id and item_id not in already_notified:
             new_hot_item_ids.append(item_id)
             new_hot_items_data.append(item)
@@ -181,7 +162,7 @@ def crawl():  # Get current values from Streamlit widgets instead of global vari
       # stcomponents.html(alert_html) # TODO: temporarily disabled need a better alert
       ding()
       print(f"🔥 DING! Found {len(new_hot_item_ids)} new HOT items!")
-  last_ran_formatted = datetime.now().time().strftime("%I:%M:%S %p")
+  last_ran_formatted = last_ran.time().strftime("%I:%M:%S %p")
   results_message.markdown(f"*Showing latest {current_max_listings} listings (per query) since last scrape at **{last_ran_formatted}***")
   # Clear previous results
   results_container.empty()  # Add CSS styles for results container
@@ -278,8 +259,6 @@ def crawl():  # Get current values from Streamlit widgets instead of global vari
             st.markdown("---")
         st.markdown('</div>', unsafe_allow_html=True)  # Close results container
 
-  countdown_timer()
-
 # End of private functions
 
 # Initialize session state
@@ -315,12 +294,37 @@ if submit:
   countdown_message.text("Scraping...")
   crawl()
 
-# Schedule the scraper to run every 3 minutes
-schedule.every(3).minutes.do(crawl)
-# Timer message
-countdown_timer() # TODO: FIRST auto scrape not working?
+# Hand the searches to the API scheduler, which scrapes them about every 3 minutes,
+# adapting the interval to how often each search gets new listings
+saved_search_ids = watch_saved_searches()
+last_renewed = time.monotonic()
+# Don't replace fresh force-scrape results with older stored ones
+last_update = datetime.now().timestamp() if submit else 0
 
-# Run the scheduler
+# Show the stored results whenever the server finishes a scrape
 while True:
-  schedule.run_pending()
-  time.sleep(2)  # Sleep for 1 second to avoid high CPU usage
\ No newline at end of file
+  if not saved_search_ids:
+    # The API may not be up yet
+    countdown_message.text("Waiting for the scraper API...")
+    saved_search_ids = watch_saved_searches()
+    last_renewed = time.monotonic()
+  else:
+    if time.monotonic() - last_renewed > SAVED_SEARCH_RENEW_SECONDS:
+      # Keep the lease so the server goes on scraping this tab's searches
+      saved_search_ids = watch_saved_searches() or saved_search_ids
+      last_renewed = time.monotonic()
+    stored_results = listing_store.load_search_results(list(saved_search_ids.values()))
+    if stored_results:
+      newest_update = max(stored['updated_at'] for stored in stored_results.values())
+      if newest_update > last_update:
+        last_update = newest_update
+        results_by_query = {
+          individual_query: stored_results[search_id]['results']
+          for individual_query, search_id in saved_search_ids.items() if search_id in stored_results
+        }
+        show_results(list(results_by_query), results_by_query, max_listings, datetime.fromtimestamp(newest_update))
+      countdown_message.text(f"Auto scraping {len(saved_search_ids)} searches on the server about every {AUTO_SCRAPE_INTERVAL_SECONDS // 60} minutes, "
+                             "more often for busy searches and less often for quiet ones")
+    else:
+      countdown_message.text("Waiting for the first server scrape...")
+  time.sleep(2)  # Sleep to avoid high CPU usage
\ No newline at end of file
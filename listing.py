@@ -0,0 +1,153 @@
+# Listing record: one Marketplace listing as it travels from the crawler to the API response.
+# Records are immutable and slotted, so caches and result history can share them without
+# copying and each one costs a fraction of the equivalent dict.
+import json
+import re
+import time
+from dataclasses import dataclass, replace
+
+# orjson is optional; the standard json module is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@dataclass(frozen=True)
+class Listing:
+    __slots__ = ('item_id', 'title', 'image', 'link', 'price', 'price_amount', 'currency', 'location',
+                 'listed_at', 'has_just_listed_pill', 'item_type')
+    item_id: str
+    title: str
+    image: str
+    link: str
+    # Price as shown ("CA$1,200", "Free"), and its parsed amount and currency
+    price: str
+    price_amount: float
+    currency: str
+    location: str
+    # Unix time the listing was created, when the card or GraphQL response tells
+    listed_at: float
+    has_just_listed_pill: bool
+    item_type: str
+
+    def with_type(self, item_type):
+        """Copy of the listing with another item type"""
+        return replace(self, item_type=item_type)
+
+    def to_dict(self):
+        """The API's JSON shape; `name` duplicates the title for older clients"""
+        return {
+            'item_id': self.item_id,
+            'name': self.title,
+            'title': self.title,
+            'image': self.image,
+            'link': self.link,
+            'price': self.price,
+            'price_amount': self.price_amount,
+            'currency': self.currency,
+            'location': self.location,
+            'listed_at': self.listed_at,
+            'has_just_listed_pill': self.has_just_listed_pill,
+            'item_type': self.item_type,
+        }
+
+
+# Listing card texts. The patterns use syntax shared by Python and JavaScript so the in-page
+# extractor classifies card texts exactly like the Python extractors.
+# A price has a currency symbol or code before or after the amount: "$15", "CA$1,200", "15 €", "USD 20"
+PRICE_PATTERN = r'^(?:([A-Z]{0,3}[$€£¥₹])\s?|([A-Z]{3}) )?(\d[\d,]*(?:\.\d{1,2})?)(?:\s?([$€£¥₹])|\s([A-Z]{3}))?$'
+# Matched against the lowercased text: "listed 3 hours ago", "a day ago"
+AGE_PATTERN = r'^(?:listed )?(\d+|an?) ?(minute|min|hour|hr|day|week|month)s? ago(?: in .+)?$'
+# "Hamilton, ON", "New York, NY"
+LOCATION_PATTERN = r'^[^\d$€£¥₹,]{2,40}, [A-Za-z][A-Za-z .]{1,30}$'
+FREE_PRICE_TEXTS = ['free']
+PRICE_RE = re.compile(PRICE_PATTERN)
+AGE_RE = re.compile(AGE_PATTERN)
+LOCATION_RE = re.compile(LOCATION_PATTERN)
+# The API's price parameters (max_price, min_price) are in hundredths of the currency unit,
+# the unit the GUI sends max_price in; card prices are parsed in whole currency units
+PRICE_PARAM_SCALE = 100
+AGE_UNIT_SECONDS = {'minute': 60, 'min': 60, 'hour': 3600, 'hr': 3600, 'day': 86400, 'week': 7 * 86400, 'month': 30 * 86400}
+
+
+def is_price_text(text):
+    if text.lower() in FREE_PRICE_TEXTS:
+        return True
+    match = PRICE_RE.match(text)
+    # A bare number is not a price; Marketplace always shows the currency
+    return match is not None and any(match.group(group) for group in (1, 2, 4, 5))
+
+
+def parse_price(text):
+    """Return (amount, currency) of a card price text, or (None, None)"""
+    if not text:
+        return None, None
+    if text.lower() in FREE_PRICE_TEXTS:
+        return 0.0, None
+    match = PRICE_RE.match(text.strip())
+    if match is None:
+        return None, None
+    currency = match.group(1) or match.group(2) or match.group(4) or match.group(5)
+    return float(match.group(3).replace(',', '')), currency
+
+
+def parse_listing_age(text):
+    """Seconds since a listing was created from a relative age text, or None"""
+    if not text:
+        return None
+    match = AGE_RE.match(text.lower())
+    if match is None:
+        return None
+    count = 1 if match.group(1) in ('a', 'an') else int(match.group(1))
+    return count * AGE_UNIT_SECONDS[match.group(2)]
+
+
+def listed_at_from_age(text, now=None):
+    age = parse_listing_age(text)
+    if age is None:
+        return None
+    return (time.time() if now is None else now) - age
+
+
+def filter_listings(listings, min_price=None, max_price=None, max_age_hours=None, now=None):
+    """Keep the listings inside a price range and age cutoff; unknown prices and ages are kept
+
+    min_price and max_price are API price parameters, in PRICE_PARAM_SCALE units.
+    """
+    if min_price is None and max_price is None and max_age_hours is None:
+        return listings
+    # Compare in the parsed card prices' whole currency units
+    if min_price is not None:
+        min_price = min_price / PRICE_PARAM_SCALE
+    if max_price is not None:
+        max_price = max_price / PRICE_PARAM_SCALE
+    oldest = None
+    if max_age_hours is not None:
+        oldest = (time.time() if now is None else now) - max_age_hours * 3600
+    kept = []
+    for listing in listings:
+        amount = listing.price_amount
+        if amount is not None:
+            if min_price is not None and amount < min_price:
+                continue
+            if max_price is not None and amount > max_price:
+                continue
+        if oldest is not None and listing.listed_at is not None and listing.listed_at < oldest:
+            continue
+        kept.append(listing)
+    return kept
+
+
+def json_default(obj):
+    if isinstance(obj, Listing):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_json(content):
+    """Serialize content that may contain Listing records to JSON bytes"""
+    if orjson is not None:
+        # Dataclasses are passed to json_default so listings keep their `name` field
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+    return json.dumps(content, default=json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,86 @@
+# Listing identity: item IDs and canonical URLs of Facebook Marketplace listings.
+# Shared by the API (app.py) and the GUI (gui.py) so both agree on what counts as the same item.
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Patterns tried in order, compiled once at import
+ITEM_ID_PATTERNS = [
+    re.compile(r'/marketplace/item/(\d+)'),  # Most common pattern
+    re.compile(r'marketplace.*?item.*?(\d+)'),  # Backup pattern
+    re.compile(r'item.*?(\d+)'),  # Even more generic
+]
+# Query parameters Facebook adds for tracking; they never change which listing a URL points to
+TRACKING_PARAMS = {'ref', 'referral_code', 'referral_story_type', 'tracking', '__tn__', '__cft__', 'mibextid', 'fbclid', '_rdr'}
+# URLs memoized per function; the same listings come back on every poll
+IDENTITY_CACHE_SIZE = 8192
+
+
+def absolute_url(url):
+    """Convert relative Facebook URLs to absolute ones"""
+    if url.startswith('/'):
+        return f"https://www.facebook.com{url}"
+    return url
+
+
+@lru_cache(maxsize=IDENTITY_CACHE_SIZE)
+def extract_item_id(url):
+    """Extract the item ID from a Facebook Marketplace URL"""
+    if not url:
+        return None
+
+    # Look for patterns like /marketplace/item/{item_id} or /marketplace/item/{item_id}/?...
+    url = absolute_url(url)
+    for pattern in ITEM_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+
+    # If no pattern matches, use the full URL as fallback (shouldn't happen but safe)
+    return url
+
+
+@lru_cache(maxsize=IDENTITY_CACHE_SIZE)
+def canonical_listing_url(url):
+    """Absolute listing URL without tracking parameters; item pages become /marketplace/item/{id}/"""
+    if not url:
+        return url
+    url = absolute_url(url)
+    parts = urlsplit(url)
+    match = ITEM_ID_PATTERNS[0].search(parts.path)
+    if match:
+        return f"https://www.facebook.com/marketplace/item/{match.group(1)}/"
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith('utm_')
+    ]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: python listing_identity.py [polls]
+    import random
+    import sys
+    import timeit
+
+    polls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    # A poll returns a few dozen listings, mostly the same ones as the previous poll
+    item_ids = [str(random.randrange(10**15, 10**16)) for _ in range(300)]
+    urls = [
+        random.choice([
+            f"/marketplace/item/{item_id}/?ref=search&referral_code=null&referral_story_type=post&tracking=browse_serp%3A{item_id}",
+            f"https://www.facebook.com/marketplace/item/{item_id}/?ref=search&__tn__=!%3AD",
+            f"https://www.facebook.com/marketplace/item/{item_id}/",
+        ])
+        for item_id in item_ids
+    ]
+    workload = [url for _ in range(polls) for url in random.sample(urls, 48)]
+
+    def uncached(url):
+        return extract_item_id.__wrapped__(url)
+
+    for name, function in [('uncached', uncached), ('memoized', extract_item_id), ('canonical_listing_url', canonical_listing_url)]:
+        seconds = timeit.timeit(lambda: [function(url) for url in workload], number=5) / 5
+        print(f"{name:>22}: {seconds * 1000:.2f} ms for {len(workload)} URLs ({seconds / len(workload) * 1e9:.0f} ns/URL)")
+    print(f"cache: {extract_item_id.cache_info()}")
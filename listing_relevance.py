@@ -0,0 +1,77 @@
+# Query relevance: which crawled listings match a search query, and in what order.
+# A query is tokenized and compiled once; titles are case folded and stripped of accents
+# so "Café" matches "cafe". Terms starting with "-" exclude listings ("bike -broken").
+import unicodedata
+from functools import lru_cache
+
+# Compiled queries kept; saved searches repeat the same few queries on every poll
+QUERY_CACHE_SIZE = 256
+# Title scores memoized per compiled query
+TITLE_SCORE_CACHE_SIZE = 2048
+
+
+def normalize_text(text):
+    """Case fold and strip accents so titles and query terms compare loosely"""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+class QueryMatcher:
+    """A tokenized query that scores listing titles"""
+
+    def __init__(self, query):
+        tokens = [normalize_text(token) for token in query.split()]
+        self.terms = list(dict.fromkeys(token for token in tokens if not token.startswith('-')))
+        self.negative_terms = list(dict.fromkeys(token[1:] for token in tokens if token.startswith('-') and len(token) > 1))
+        # What is sent to Facebook: the positive terms as typed
+        self.search_query = ' '.join(token for token in query.split() if not token.startswith('-'))
+        self.phrase = ' '.join(self.terms)
+        # " term " finds whole-word occurrences in a title padded with spaces
+        self._padded_terms = {term: f' {term} ' for term in self.terms}
+        # The same listings come back poll after poll, so scores are memoized per title
+        self.score = lru_cache(maxsize=TITLE_SCORE_CACHE_SIZE)(self._score)
+
+    def _score(self, title):
+        """Relevance of a title, or None when it does not match the query"""
+        if title is None:
+            return None
+        text = normalize_text(title)
+        for term in self.negative_terms:
+            if term in text:
+                return None
+        if not self.terms:
+            # Only negative terms: everything else matches equally
+            return 0.0
+        # Substring tests run in C; for the few terms of a query they beat a regex alternation
+        found = [term for term in self.terms if term in text]
+        if not found:
+            return None
+        # Every query term found counts most, whole-word matches and the full phrase break ties
+        padded = f' {text} '
+        score = len(found) + 0.5 * sum(1 for term in found if self._padded_terms[term] in padded)
+        if len(found) > 1 and self.phrase in text:
+            score += 1.0
+        return score
+
+    def score_all(self, titles):
+        """Relevance of every title, None for the titles that do not match"""
+        return [self.score(title) for title in titles]
+
+    def matches(self, title):
+        return self.score(title) is not None
+
+    def rank(self, items, title=lambda item: item['title']):
+        """Matching items, best score first; equal scores keep their page order"""
+        scores = self.score_all([title(item) for item in items])
+        scored = [(score, item) for score, item in zip(scores, items) if score is not None]
+        # sorted() is stable, so the newest-first page order breaks ties
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [item for score, item in scored]
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def compile_query(query):
+    """QueryMatcher for a query, built once per distinct query"""
+    return QueryMatcher(query)
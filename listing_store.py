@@ -0,0 +1,402 @@
+# Description: SQLite store for seen listings and HOT item notifications, shared by the API (app.py) and the Streamlit GUI (gui.py).
+# Usage: python listing_store.py [hot_items_notifications.json]  (one-shot import of the old JSON tracking file)
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Database file shared by the API and GUI processes
+LISTING_STORE_PATH = os.getenv('LISTING_STORE_PATH', 'listings.db')
+# Legacy JSON tracking file, imported once into the database
+NOTIFICATION_TRACKING_FILE = "hot_items_notifications.json"
+# Notifications older than this are forgotten so an item can become hot again
+NOTIFICATION_TTL_SECONDS = 7 * 24 * 60 * 60
+# Seconds between write-behind flushes of the in-memory notified-items cache
+NOTIFIED_CACHE_FLUSH_INTERVAL = float(os.getenv('NOTIFIED_CACHE_FLUSH_INTERVAL', '5'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notified_items (
+    item_id TEXT PRIMARY KEY,
+    notified_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notified_items_notified_at ON notified_items (notified_at);
+
+CREATE TABLE IF NOT EXISTS seen_listings (
+    item_id TEXT PRIMARY KEY,
+    title TEXT,
+    image TEXT,
+    link TEXT,
+    item_type TEXT,
+    city TEXT,
+    query TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_seen_listings_first_seen ON seen_listings (first_seen);
+
+CREATE TABLE IF NOT EXISTS saved_searches (
+    search_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    city TEXT NOT NULL,
+    query TEXT NOT NULL,
+    max_price INTEGER NOT NULL,
+    max_results INTEGER NOT NULL,
+    interval_seconds REAL NOT NULL,
+    jitter_seconds REAL NOT NULL,
+    adaptive INTEGER NOT NULL DEFAULT 1,
+    min_price REAL,
+    max_age_hours REAL,
+    lease_expires_at REAL,
+    created_at REAL NOT NULL,
+    UNIQUE (city, query, max_price, max_results)
+);
+
+CREATE TABLE IF NOT EXISTS search_results (
+    search_id INTEGER PRIMARY KEY,
+    results TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Column order of saved search rows, independent of the order columns were added in
+SAVED_SEARCH_COLUMNS = ('search_id, city, query, max_price, max_results, interval_seconds, jitter_seconds, adaptive, '
+                        'min_price, max_age_hours, lease_expires_at, created_at')
+
+
+class ListingStore:
+    """Thread-safe access to the listings database; each thread gets its own connection"""
+
+    def __init__(self, path=LISTING_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            # Databases created before adaptive polling lack the column
+            self._add_column_if_missing(conn, 'saved_searches', 'adaptive', 'INTEGER NOT NULL DEFAULT 1')
+            # ...and these ones before local price and age filters
+            self._add_column_if_missing(conn, 'saved_searches', 'min_price', 'REAL')
+            self._add_column_if_missing(conn, 'saved_searches', 'max_age_hours', 'REAL')
+            self._add_column_if_missing(conn, 'saved_searches', 'lease_expires_at', 'REAL')
+
+    @staticmethod
+    def _add_column_if_missing(conn, table, column, definition):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # A generous busy timeout lets the API and GUI processes take turns writing
+            conn = sqlite3.connect(self.path, timeout=30)
+            # WAL lets readers in one process work while the other process writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def load_notified_item_ids(self, ttl=NOTIFICATION_TTL_SECONDS):
+        """Return the IDs of items notified within the TTL, dropping older entries"""
+        self.cleanup_notifications(ttl)
+        cutoff = time.time() - ttl
+        rows = self._connection().execute(
+            'SELECT item_id FROM notified_items WHERE notified_at > ?', (cutoff,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def load_notified_items_since(self, since):
+        """Return (item_id, notified_at) rows newer than since, oldest first"""
+        return self._connection().execute(
+            'SELECT item_id, notified_at FROM notified_items WHERE notified_at > ? ORDER BY notified_at', (since,)
+        ).fetchall()
+
+    def add_notified_items(self, item_ids, notified_at=None):
+        """Record that notifications were sent for these item IDs"""
+        notified_at = time.time() if notified_at is None else notified_at
+        self.save_notified_items([(item_id, notified_at) for item_id in item_ids])
+
+    def save_notified_items(self, rows):
+        """Write (item_id, notified_at) rows in one transaction"""
+        with self._connection() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO notified_items (item_id, notified_at) VALUES (?, ?)',
+                rows
+            )
+
+    def cleanup_notifications(self, ttl=NOTIFICATION_TTL_SECONDS):
+        """Delete notifications older than the TTL; returns the number removed"""
+        with self._connection() as conn:
+            cursor = conn.execute('DELETE FROM notified_items WHERE notified_at <= ?', (time.time() - ttl,))
+        return cursor.rowcount
+
+    def record_seen_listings(self, listings, city=None, query=None, seen_at=None):
+        """Insert new listings and refresh last_seen/item_type of known ones"""
+        seen_at = time.time() if seen_at is None else seen_at
+        rows = [
+            (item['item_id'], item.get('title'), item.get('image'), item.get('link'),
+             item.get('item_type'), city, query, seen_at, seen_at)
+            for item in listings if item.get('item_id')
+        ]
+        with self._connection() as conn:
+            conn.executemany(
+                '''INSERT INTO seen_listings (item_id, title, image, link, item_type, city, query, first_seen, last_seen)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(item_id) DO UPDATE SET
+                       last_seen = excluded.last_seen,
+                       item_type = excluded.item_type''',
+                rows
+            )
+
+    def load_first_seen(self, item_ids):
+        """Return {item_id: first_seen} for the listings that have been seen before"""
+        item_ids = [item_id for item_id in item_ids if item_id]
+        if not item_ids:
+            return {}
+        placeholders = ', '.join('?' for _ in item_ids)
+        rows = self._connection().execute(
+            f'SELECT item_id, first_seen FROM seen_listings WHERE item_id IN ({placeholders})',
+            item_ids
+        ).fetchall()
+        return dict(rows)
+
+    def save_search(self, city, query, max_price, max_results, interval_seconds, jitter_seconds, adaptive=True,
+                    min_price=None, max_age_hours=None, lease_seconds=None):
+        """Create a saved search, or update the interval and filters of an identical one; returns the saved search
+
+        With lease_seconds the search expires unless it is saved again within that time.
+        Several clients may hold the same search: a renewal never shortens the lease, and a
+        search saved without a lease by anyone is kept for good.
+        """
+        now = time.time()
+        lease_expires_at = now + lease_seconds if lease_seconds is not None else None
+        with self._connection() as conn:
+            conn.execute(
+                '''INSERT INTO saved_searches (city, query, max_price, max_results, interval_seconds, jitter_seconds, adaptive,
+                                               min_price, max_age_hours, lease_expires_at, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(city, query, max_price, max_results) DO UPDATE SET
+                       interval_seconds = excluded.interval_seconds,
+                       jitter_seconds = excluded.jitter_seconds,
+                       adaptive = excluded.adaptive,
+                       min_price = excluded.min_price,
+                       max_age_hours = excluded.max_age_hours,
+                       lease_expires_at = CASE
+                           WHEN saved_searches.lease_expires_at IS NULL OR excluded.lease_expires_at IS NULL THEN NULL
+                           ELSE MAX(saved_searches.lease_expires_at, excluded.lease_expires_at)
+                       END''',
+                (city, query, max_price, max_results, interval_seconds, jitter_seconds, int(adaptive),
+                 min_price, max_age_hours, lease_expires_at, now)
+            )
+        row = self._connection().execute(
+            f'SELECT {SAVED_SEARCH_COLUMNS} FROM saved_searches WHERE city = ? AND query = ? AND max_price = ? AND max_results = ?',
+            (city, query, max_price, max_results)
+        ).fetchone()
+        return self._saved_search_row(row)
+
+    def load_saved_searches(self):
+        """Return every saved search"""
+        rows = self._connection().execute(f'SELECT {SAVED_SEARCH_COLUMNS} FROM saved_searches ORDER BY search_id').fetchall()
+        return [self._saved_search_row(row) for row in rows]
+
+    def delete_saved_search(self, search_id, lease_expired_before=None):
+        """Delete a saved search and its stored results; returns whether it existed
+
+        With lease_expired_before, only delete the search while its lease ended before that time,
+        so a renewal that just happened wins.
+        """
+        with self._connection() as conn:
+            if lease_expired_before is None:
+                cursor = conn.execute('DELETE FROM saved_searches WHERE search_id = ?', (search_id,))
+            else:
+                cursor = conn.execute(
+                    'DELETE FROM saved_searches WHERE search_id = ? AND lease_expires_at < ?',
+                    (search_id, lease_expired_before)
+                )
+            if cursor.rowcount > 0:
+                conn.execute('DELETE FROM search_results WHERE search_id = ?', (search_id,))
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _saved_search_row(row):
+        search = dict(zip(SAVED_SEARCH_COLUMNS.split(', '), row))
+        search['adaptive'] = bool(search['adaptive'])
+        return search
+
+    def save_search_results(self, search_id, results, error=None):
+        """Replace the latest results of a saved search"""
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO search_results (search_id, results, error, updated_at) VALUES (?, ?, ?, ?)',
+                (search_id, json.dumps(results), error, time.time())
+            )
+
+    def save_search_error(self, search_id, error):
+        """Record a failed run of a saved search, keeping its last results"""
+        with self._connection() as conn:
+            conn.execute(
+                '''INSERT INTO search_results (search_id, results, error, updated_at) VALUES (?, '[]', ?, ?)
+                   ON CONFLICT(search_id) DO UPDATE SET error = excluded.error''',
+                (search_id, error, time.time())
+            )
+
+    def load_search_results(self, search_ids):
+        """Return {search_id: {'results', 'error', 'updated_at'}} for the saved searches that have run"""
+        if not search_ids:
+            return {}
+        placeholders = ', '.join('?' for _ in search_ids)
+        rows = self._connection().execute(
+            f'SELECT search_id, results, error, updated_at FROM search_results WHERE search_id IN ({placeholders})',
+            list(search_ids)
+        ).fetchall()
+        return {
+            search_id: {'results': json.loads(results), 'error': error, 'updated_at': updated_at}
+            for search_id, results, error, updated_at in rows
+        }
+
+    def import_json_file(self, path=NOTIFICATION_TRACKING_FILE):
+        """Import a legacy {item_id: timestamp} tracking file; returns the number of items imported"""
+        if not Path(path).exists():
+            return 0
+        with open(path, 'r') as f:
+            data = json.load(f)
+        with self._connection() as conn:
+            # Keep the newer timestamp when an item is already in the database
+            conn.executemany(
+                '''INSERT INTO notified_items (item_id, notified_at) VALUES (?, ?)
+                   ON CONFLICT(item_id) DO UPDATE SET notified_at = MAX(notified_at, excluded.notified_at)''',
+                [(str(item_id), float(timestamp)) for item_id, timestamp in data.items()]
+            )
+            conn.execute('INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)', ('json_imported_from', str(path)))
+        logger.info(f"Imported {len(data)} notified items from {path}")
+        return len(data)
+
+    def import_json_file_once(self, path=NOTIFICATION_TRACKING_FILE):
+        """Import the legacy tracking file the first time the database is used"""
+        row = self._connection().execute(
+            'SELECT value FROM store_meta WHERE key = ?', ('json_imported_from',)
+        ).fetchone()
+        if row is None:
+            return self.import_json_file(path)
+        return 0
+
+
+class NotifiedItemsCache:
+    """In-process notified-items cache in front of a ListingStore with write-behind persistence"""
+
+    def __init__(self, store, ttl=NOTIFICATION_TTL_SECONDS, flush_interval=NOTIFIED_CACHE_FLUSH_INTERVAL):
+        self.store = store
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        # item_id -> notified_at in time order, so expired entries are always at the front
+        self._items = OrderedDict()
+        # Entries added since the last flush
+        self._pending = {}
+        self._last_synced_at = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._sync_from_store()
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl
+        while self._items:
+            item_id, notified_at = next(iter(self._items.items()))
+            if notified_at > cutoff:
+                break
+            self._items.popitem(last=False)
+
+    def _sync_from_store(self):
+        """Pull in notifications written by other processes (e.g. the GUI) since the last sync"""
+        since = max(self._last_synced_at, time.time() - self.ttl)
+        rows = self.store.load_notified_items_since(since)
+        with self._lock:
+            newest = next(reversed(self._items.values()), None)
+            out_of_order = False
+            for item_id, notified_at in rows:
+                if item_id not in self._items:
+                    self._items[item_id] = notified_at
+                    out_of_order = out_of_order or (newest is not None and notified_at < newest)
+                self._last_synced_at = max(self._last_synced_at, notified_at)
+            if out_of_order:
+                # Rows older than our own newest entry: restore the time order eviction relies on
+                self._items = OrderedDict(sorted(self._items.items(), key=lambda entry: entry[1]))
+
+    def is_notified(self, item_id):
+        with self._lock:
+            self._evict_expired()
+            return item_id in self._items
+
+    def item_ids(self):
+        """Return a copy of the notified item IDs within the TTL"""
+        with self._lock:
+            self._evict_expired()
+            return set(self._items)
+
+    def add(self, item_ids):
+        """Mark items as notified; they are written to the store on the next flush"""
+        now = time.time()
+        with self._lock:
+            for item_id in item_ids:
+                # Re-notified items move to the back so the order stays by time
+                self._items.pop(item_id, None)
+                self._items[item_id] = now
+                self._pending[item_id] = now
+
+    def flush(self):
+        """Write the pending entries to the store in one batch"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            self.store.save_notified_items(list(pending.items()))
+            self.store.cleanup_notifications(self.ttl)
+        except Exception as e:
+            logger.error(f"Error flushing notified items: {e}")
+            # Put them back so the next flush retries
+            with self._lock:
+                for item_id, notified_at in pending.items():
+                    self._pending.setdefault(item_id, notified_at)
+            return 0
+        return len(pending)
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+            try:
+                self._sync_from_store()
+            except Exception as e:
+                logger.warning(f"Error syncing notified items from store: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the write-behind thread and flush what is left"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    json_path = sys.argv[1] if len(sys.argv) > 1 else NOTIFICATION_TRACKING_FILE
+    count = ListingStore().import_json_file(json_path)
+    print(f"Imported {count} notified items from {json_path} into {LISTING_STORE_PATH}")
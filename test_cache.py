@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the crawl result cache: coalescing, cancelling abandoned crawls and stale results
+Run with: python -m pytest test_cache.py
+"""
+
+import os
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+# Add the parent directory to Python path to import from app.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from app import CrawlResultCache
+
+
+@pytest.fixture
+def crawls(monkeypatch):
+    """Replace the worker pool: every submitted crawl is a Future the test resolves itself"""
+    submitted = []
+
+    def submit_crawl_job(city, query, max_price, max_results, suggested):
+        future = Future()
+        submitted.append(future)
+        return future
+
+    monkeypatch.setattr(app, 'submit_crawl_job', submit_crawl_job)
+    return submitted
+
+
+def test_identical_requests_share_a_crawl(crawls):
+    cache = CrawlResultCache()
+    first, status = cache.get_future('toronto', 'vhs', 100, 8, False)
+    assert status == 'MISS'
+    second, status = cache.get_future('toronto', 'VHS ', 100, 4, False)
+    assert status == 'COALESCED'
+    assert len(crawls) == 1
+
+    crawls[0].set_result(['a', 'b', 'c', 'd', 'e'])
+    # Every caller gets its own list, cut to its own max_results
+    assert first.result(timeout=1) == ['a', 'b', 'c', 'd', 'e']
+    assert second.result(timeout=1) == ['a', 'b', 'c', 'd']
+    assert cache.get_future('toronto', 'vhs', 100, 8, False)[1] == 'HIT'
+
+
+def test_larger_request_does_not_join_a_smaller_crawl(crawls):
+    cache = CrawlResultCache()
+    cache.get_future('toronto', 'vhs', 100, 4, False)
+    assert cache.get_future('toronto', 'vhs', 100, 8, False)[1] == 'MISS'
+    assert len(crawls) == 2
+
+
+def test_crawl_cancelled_when_last_waiter_gives_up(crawls):
+    cache = CrawlResultCache()
+    first, _ = cache.get_future('toronto', 'vhs', 100, 8, False)
+    second, _ = cache.get_future('toronto', 'vhs', 100, 8, False)
+
+    first.cancel()
+    # Another caller still waits for the crawl
+    assert not crawls[0].cancelled()
+    second.cancel()
+    assert crawls[0].cancelled()
+    # The cancelled crawl is neither cached nor joined by the next caller
+    future, status = cache.get_future('toronto', 'vhs', 100, 8, False)
+    assert status == 'MISS'
+    assert len(crawls) == 2
+    assert not future.cancelled()
+
+
+def test_failed_crawl_is_not_cached(crawls):
+    cache = CrawlResultCache()
+    future, _ = cache.get_future('toronto', 'vhs', 100, 8, False)
+    crawls[0].set_exception(RuntimeError('browser crashed'))
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+    assert cache.get_future('toronto', 'vhs', 100, 8, False)[1] == 'MISS'
+
+
+def test_stale_result_served_while_refreshing(crawls):
+    cache = CrawlResultCache(ttl=0, stale_ttl=3600)
+    cache.get_future('toronto', 'vhs', 100, 8, False)
+    crawls[0].set_result(['old'])
+
+    future, status = cache.get_future('toronto', 'vhs', 100, 8, False)
+    assert status == 'STALE'
+    assert future.result(timeout=1) == ['old']
+    # One background refresh, which nobody waits on and which is never cancelled
+    assert cache.get_future('toronto', 'vhs', 100, 8, False)[1] == 'STALE'
+    assert len(crawls) == 2
+    assert not crawls[1].cancelled()
+
+    crawls[1].set_result(['new'])
+    assert cache.get_future('toronto', 'vhs', 100, 8, False)[0].result(timeout=1) == ['new']
+
+
+def test_stale_result_not_served_without_allow_stale(crawls):
+    cache = CrawlResultCache(ttl=0, stale_ttl=3600)
+    cache.get_future('toronto', 'vhs', 100, 8, False)
+    crawls[0].set_result(['old'])
+
+    future, status = cache.get_future('toronto', 'vhs', 100, 8, False, allow_stale=False)
+    assert status == 'MISS'
+    crawls[1].set_result(['new'])
+    assert future.result(timeout=1) == ['new']
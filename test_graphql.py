@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the GraphQL extraction mode against a recorded Marketplace search response
+Run with: python -m pytest test_graphql.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path to import from app.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import (
+    GraphQLResponseCollector, GRAPHQL_JUST_LISTED_SECONDS, graphql_listing_to_record,
+    iter_json_documents, parse_marketplace_graphql_payload,
+)
+
+FIXTURE_DIR = Path(__file__).parent / 'fixtures'
+# A search response body: the "for (;;);" guard, the first page of results, a deferred
+# chunk with more results, a truncated chunk and the final marker, one document per line
+SEARCH_RESPONSE = FIXTURE_DIR / 'marketplace_search_graphql.txt'
+
+
+def load_fixture():
+    return SEARCH_RESPONSE.read_text(encoding='utf-8')
+
+
+class RecordedResponse:
+    """Stands in for a Playwright response replayed from a recording"""
+
+    def __init__(self, body, url='https://www.facebook.com/api/graphql/', post_data='fb_api_req_friendly_name=MarketplaceSearchResultsPaginationQuery'):
+        self.body = body
+        self.url = url
+        self.request = type('Request', (), {'post_data': post_data})()
+
+    def text(self):
+        return self.body
+
+
+def test_iter_json_documents_multi_document_body():
+    body = load_fixture()
+    assert body.startswith('for (;;);')
+    documents = list(iter_json_documents(body))
+    # The truncated chunk is skipped, the documents around it are kept
+    assert len(documents) == 3
+    assert 'marketplace_search' in documents[0]['data']
+    assert documents[1]['path'] == ['marketplace_search', 'feed_units']
+    assert documents[2] == {'extensions': {'is_final': True}}
+
+
+def test_iter_json_documents_without_guard():
+    assert list(iter_json_documents('{"a": 1}\n\n{"b": 2}')) == [{'a': 1}, {'b': 2}]
+    assert list(iter_json_documents('')) == []
+
+
+def test_parse_payload_records():
+    listings = parse_marketplace_graphql_payload(load_fixture())
+    # Sponsored units have no Marketplace listing title and are skipped
+    assert [listing['item_id'] for listing in listings] == [
+        '1027385546291841', '884512930017402', '739201846651127', '990127364518823', '1027385546291841',
+    ]
+    first = listings[0]
+    assert first['title'] == 'Horror VHS lot - Evil Dead, Hellraiser'
+    assert first['post_url'] == 'https://www.facebook.com/marketplace/item/1027385546291841/'
+    assert first['image'].startswith('https://scontent.')
+    assert first['price'] == 'CA$120'
+    assert first['location'] == 'Hamilton, ON'
+    assert first['listed_at'] == 1760000000
+    # Missing photo, creation time and state
+    assert listings[2]['image'] is None
+    assert listings[2]['listed_at'] is None
+    assert listings[3]['location'] == 'Oakville'
+    # Records have the same fields as the HTML extractors' records
+    assert {'image', 'title', 'post_url', 'has_just_listed_pill', 'price', 'location', 'listed_age'} <= set(first)
+
+
+def test_just_listed_from_creation_time():
+    listing = {'id': '42', 'marketplace_listing_title': 'VHS tape', 'creation_time': 1760000000}
+    assert graphql_listing_to_record(listing, now=1760000000 + 60)['has_just_listed_pill'] is True
+    assert graphql_listing_to_record(listing, now=1760000000 + GRAPHQL_JUST_LISTED_SECONDS + 1)['has_just_listed_pill'] is False
+    assert graphql_listing_to_record({'id': 42, 'marketplace_listing_title': 'VHS tape'})['item_id'] == '42'
+
+
+def test_collector_filters_and_deduplicates():
+    collector = GraphQLResponseCollector()
+    body = load_fixture()
+    collector.on_response(RecordedResponse(body))
+    # The same results again in a later response, then responses that are not search results
+    collector.on_response(RecordedResponse(body))
+    collector.on_response(RecordedResponse(body, post_data='fb_api_req_friendly_name=CometNotificationsQuery'))
+    collector.on_response(RecordedResponse(body, url='https://www.facebook.com/ajax/bz'))
+    listings, payload_bytes = collector.collect_listings()
+    assert len(collector.responses) == 2
+    assert [listing['item_id'] for listing in listings] == [
+        '1027385546291841', '884512930017402', '739201846651127', '990127364518823',
+    ]
+    assert payload_bytes == 2 * len(body.encode('utf-8'))
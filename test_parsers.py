@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the HTML parser backends
+Every backend must extract the same listings from a saved Marketplace search page
+Run with: python -m pytest test_parsers.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to Python path to import from app.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import parse_listings_html, resolve_parser_backend
+
+FIXTURE_DIR = Path(__file__).parent / 'fixtures'
+SEARCH_PAGE = FIXTURE_DIR / 'marketplace_search.html'
+BACKENDS = ['lxml', 'selectolax', 'html.parser']
+
+
+def load_fixture():
+    return SEARCH_PAGE.read_text(encoding='utf-8')
+
+
+def installed(backend):
+    """Skip a backend whose parser is not installed instead of testing its fallback"""
+    if resolve_parser_backend(backend) != backend:
+        pytest.skip(f"{backend} is not installed")
+
+
+def test_fixture_listings():
+    """The reference backend finds every listing card once, with all its fields"""
+    listings, backend = parse_listings_html(load_fixture(), backend='html.parser')
+    assert backend == 'html.parser'
+    # The second anchor of the first card and the navigation links are not listings
+    assert [listing['title'] for listing in listings] == [
+        'Horror VHS lot - Evil Dead, Hellraiser',
+        'Box of VHS tapes, kids movies & Disney',
+        'Panasonic VCR with remote, works great',
+        'Les Dents de la mer – cassette VHS',
+        'Star Wars trilogy VHS box set, sealed',
+    ]
+    first = listings[0]
+    assert first['post_url'].startswith('https://www.facebook.com/marketplace/item/1027385546291841/')
+    assert first['image'].startswith('https://scontent.')
+    assert first['price'] == 'CA$120'
+    assert first['location'] == 'Hamilton, ON'
+    assert first['has_just_listed_pill'] is True
+    # The struck-through original price is neither the price nor the title
+    assert listings[2]['price'] == '$45'
+    assert listings[2]['listed_age'] == 'Listed 3 hours ago'
+    assert listings[3]['image'] is None
+    assert [listing['has_just_listed_pill'] for listing in listings] == [True, False, False, True, False]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backend_parity(backend):
+    installed(backend)
+    expected, _ = parse_listings_html(load_fixture(), backend='html.parser')
+    listings, used = parse_listings_html(load_fixture(), backend=backend)
+    assert used == backend
+    assert listings == expected
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backend_parity_stop_at_ids(backend):
+    """Incremental crawls stop at the first known listing with every backend"""
+    installed(backend)
+    stop_at_ids = {'739201846651127'}
+    listings, _ = parse_listings_html(load_fixture(), backend=backend, stop_at_ids=stop_at_ids)
+    assert [listing['title'] for listing in listings] == [
+        'Horror VHS lot - Evil Dead, Hellraiser',
+        'Box of VHS tapes, kids movies & Disney',
+    ]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backend_parity_changed_layout(backend):
+    """Without item anchors every backend falls back to the same multi-strategy finders"""
+    installed(backend)
+    html = load_fixture().replace('/marketplace/item/', '/marketplace/listing/')
+    expected, _ = parse_listings_html(html, backend='html.parser')
+    listings, _ = parse_listings_html(html, backend=backend)
+    assert expected
+    assert listings == expected
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backend_parity_changed_layout_stop_at_ids(backend):
+    """Without item anchors a known item ID cannot end the page early, so every backend falls back"""
+    installed(backend)
+    html = load_fixture().replace('/marketplace/item/', '/marketplace/listing/')
+    stop_at_ids = {'739201846651127'}
+    expected, _ = parse_listings_html(html, backend='html.parser', stop_at_ids=stop_at_ids)
+    listings, _ = parse_listings_html(html, backend=backend, stop_at_ids=stop_at_ids)
+    assert expected
+    assert listings == expected